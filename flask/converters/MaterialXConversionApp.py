@@ -1,30 +1,46 @@
 import base64
 import os
 import argparse
-import datetime
 import platform
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-from flask import Flask, render_template
-from flask_socketio import SocketIO, emit
+from flask import Flask, render_template, request, jsonify
+from flask_socketio import SocketIO, emit, join_room, leave_room
 
 import MaterialX as mx
 
+from mtlxstdlib import getStandardLibrary, warmStandardLibrary
+from conversioncache import ConversionCache
+from mtlxrenderer import MaterialXRenderer
+
+# Allowed and default width and height of rendered images
+RENDER_SIZE_RANGE = (16, 4096)
+DEFAULT_RENDER_SIZE = 512
+
 # Try to import usdmtlx. If cannot, set flag to False
 # -- Not really required as part of Python package requirements
 try:
     from usdmtlx import convertMtlxToUsd
+    from pxr import Usd
+    usd_version = '.'.join(str(v) for v in Usd.GetVersion())
     have_usd_converter = True
 except ImportError:
     print('Cannot import usdmtlx')
+    usd_version = ''
     have_usd_converter = False
 
 # Try to import gltf_materialx_converter. If cannot, set flag to False
 try:
     from gltf_materialx_converter import converter as MxGLTFPT
     from gltf_materialx_converter import utilities as MxGLTFPTUtil
+    import gltf_materialx_converter
+    gltf_version = getattr(gltf_materialx_converter, '__version__', '')
     have_gltf_converter = True
 except ImportError:
     print('Cannot import gltf_materialx_converter')
+    gltf_version = ''
     have_gltf_converter = False
 
 def get_os_details():
@@ -35,13 +51,34 @@ def get_os_details():
     }
 
 class MaterialXFlaskApp:
-    def __init__(self, home):
+    def __init__(self, home, max_workers=None, worker_type='thread', max_queued_jobs=32):
         self.home = home
 
         # Initialize Flask and SocketIO
         self.app = Flask(__name__)
         self.socketio = SocketIO(self.app)
 
+        # Shared room joined by each client session. Responses are sent to all
+        # clients in the room if the requesting client joined one, and otherwise
+        # only to the requesting client.
+        self.client_rooms = {}
+
+        # Connected client sessions. Guarded together with client_rooms by client_lock.
+        self.connected_clients = set()
+        self.client_lock = threading.Lock()
+
+        # Job pool used to run CPU-bound handlers off the SocketIO event thread.
+        # Jobs are dispatched by a thread pool. If a process pool is requested
+        # the dispatching thread hands the work off to it.
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queued_jobs = max_queued_jobs
+        self.job_executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='mx_job')
+        self.process_executor = None
+        if worker_type == 'process':
+            self.process_executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self.jobs = {}
+        self.jobs_lock = threading.Lock()
+
         # Register routes and events
         self._register_routes()
         self._setup_event_handler_map()
@@ -53,6 +90,7 @@ class MaterialXFlaskApp:
         print(f"  * OS: {self.os_details['os']}")
         print(f"  * Release: {self.os_details['release']}")
         print(f"  * Architecture: {self.os_details['architecture']}")
+        print(f'  * Job workers: {self.max_workers} ({worker_type})')
 
     def _register_routes(self):
         '''
@@ -78,6 +116,173 @@ class MaterialXFlaskApp:
         # Dynamically register event handlers
         for event_name, handler in self.event_handlers.items():
             self.socketio.on_event(event_name, handler)        
+        self.socketio.on_event('connect', self.handle_connect)
+        self.socketio.on_event('join_room', self.handle_join_room)
+        self.socketio.on_event('leave_room', self.handle_leave_room)
+        self.socketio.on_event('disconnect', self.handle_disconnect)
+        self.socketio.on_event('cancel_job', self.handle_cancel_job)
+
+    def handle_connect(self, auth=None):
+        '''
+        Record a connected client session.
+        '''
+        with self.client_lock:
+            self.connected_clients.add(request.sid)
+
+    def handle_join_room(self, data):
+        '''
+        Handle request to join a shared room. Responses to requests from any client
+        in the room are sent to all clients in the room. Rooms named after a connected
+        client session are rejected, as joining one would receive that client's responses.
+        '''
+        room = data.get('room', '')
+        if not room:
+            return
+        with self.client_lock:
+            if room in self.connected_clients:
+                rejected = True
+            else:
+                rejected = False
+                previous_room = self.client_rooms.get(request.sid)
+                self.client_rooms[request.sid] = room
+        if rejected:
+            emit('room_rejected', { 'room': room })
+            return
+        if previous_room:
+            leave_room(previous_room)
+        join_room(room)
+        emit('room_joined', { 'room': room })
+
+    def handle_leave_room(self, data):
+        '''
+        Handle request to leave the shared room. Responses are then only sent to the client.
+        '''
+        with self.client_lock:
+            room = self.client_rooms.pop(request.sid, None)
+        if room:
+            leave_room(room)
+        emit('room_left', { 'room': room })
+
+    def handle_disconnect(self, reason=None):
+        '''
+        Remove a disconnected client session and its room.
+        '''
+        with self.client_lock:
+            self.connected_clients.discard(request.sid)
+            self.client_rooms.pop(request.sid, None)
+
+    def _client_target(self):
+        '''
+        Return the recipient of responses to the current request: the shared room
+        of the requesting client if it joined one, otherwise the client session.
+        Must be called from within a SocketIO event handler.
+        '''
+        with self.client_lock:
+            return self.client_rooms.get(request.sid, request.sid)
+
+    def _emit_to_client(self, event, data, to=None):
+        '''
+        Emit a response to the requesting client, or to all clients in its shared room.
+        @param event The event name.
+        @param data The event data.
+        @param to The recipient returned by _client_target(). Required when called
+        outside of a SocketIO event handler.
+        '''
+        self.socketio.emit(event, data, to=to or self._client_target())
+
+    def submit_job(self, result_event, job_function, job_args, error_result=None, on_result=None,
+                   use_process_pool=True):
+        '''
+        Run a CPU-bound job on the job pool and emit its result when done.
+        Must be called from within a SocketIO event handler.
+
+        The requesting client receives 'job_progress' events of the form:
+        { 'jobId': string, 'event': result_event, 'status': 'queued' | 'running', 'queued': int }
+        followed by a 'job_done' event with a status of 'done', 'error', 'cancelled' or 'rejected'.
+
+        @param result_event The event used to emit the result returned by the job.
+        @param job_function The function to run. Must be picklable if a process pool is used.
+        It returns the result event data, or None if there is nothing to emit.
+        @param job_args Tuple of arguments passed to the job function.
+        @param error_result Result event data to emit if the job fails or is rejected.
+        @param on_result Optional callback called with the result of a successful job.
+        @param use_process_pool Run the job on the process pool if one is used. Set to False
+        for jobs which launch their own processes, or which are not picklable.
+        @return The job identifier, or None if the job queue is full.
+        '''
+        job = {
+            'id': uuid.uuid4().hex,
+            'event': result_event,
+            'sid': request.sid,
+            'use_process_pool': use_process_pool,
+            'target': self._client_target(),
+            'cancelled': threading.Event(),
+            'future': None
+        }
+        with self.jobs_lock:
+            accepted = len(self.jobs) < self.max_queued_jobs
+            if accepted:
+                self.jobs[job['id']] = job
+            queued = len(self.jobs)
+
+        if not accepted:
+            print(f'>> Job queue full. Rejecting: {result_event}')
+            emit('job_done', {'jobId': None, 'event': result_event, 'status': 'rejected'})
+            if error_result is not None:
+                self._emit_to_client(result_event, error_result)
+            return None
+
+        emit('job_progress', {'jobId': job['id'], 'event': result_event, 'status': 'queued', 'queued': queued})
+        job['future'] = self.job_executor.submit(self._run_job, job, job_function, job_args, error_result, on_result)
+        return job['id']
+
+    def _run_job(self, job, job_function, job_args, error_result, on_result):
+        '''
+        Job pool entry point. Runs the job and emits the result to the requesting client,
+        or to all clients in its shared room.
+        '''
+        self.socketio.emit('job_progress', {'jobId': job['id'], 'event': job['event'], 'status': 'running', 'queued': len(self.jobs)}, to=job['sid'])
+        status = 'done'
+        try:
+            if self.process_executor and job['use_process_pool']:
+                result = self.process_executor.submit(job_function, *job_args).result()
+            else:
+                result = job_function(*job_args)
+        except Exception as e:
+            print(f'>> Error running job {job["event"]}: {e}')
+            result = error_result
+            status = 'error'
+        finally:
+            with self.jobs_lock:
+                self.jobs.pop(job['id'], None)
+
+        if status == 'done' and result is not None and on_result:
+            on_result(result)
+
+        # Results of a job cancelled while running are dropped
+        if job['cancelled'].is_set():
+            status = 'cancelled'
+        elif result is not None:
+            self._emit_to_client(job['event'], result, job['target'])
+        self.socketio.emit('job_done', {'jobId': job['id'], 'event': job['event'], 'status': status}, to=job['sid'])
+
+    def handle_cancel_job(self, data):
+        '''
+        Handle request to cancel a job. Queued jobs are removed from the queue,
+        and the results of running jobs are discarded.
+        '''
+        job_id = data.get('jobId', '')
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+        if not job:
+            return
+
+        job['cancelled'].set()
+        future = job['future']
+        if future and future.cancel():
+            with self.jobs_lock:
+                self.jobs.pop(job_id, None)
+            emit('job_done', {'jobId': job_id, 'event': job['event'], 'status': 'cancelled'})
 
     def run(self, host, port, deployment_platform, debug=True):
         '''
@@ -89,11 +294,47 @@ class MaterialXFlaskApp:
 class MaterialXConversionApp(MaterialXFlaskApp):
     '''
     '''
-    def __init__(self, homePage):
+    def __init__(self, homePage, warmup=True, max_workers=None, worker_type='thread', max_queued_jobs=32,
+                 conversion_cache=None, renderer=None, render_cache=None):
         '''
         Constructor
         '''
-        super().__init__(homePage)
+        # Cache of USD and glTF conversion results
+        self.conversion_cache = conversion_cache or ConversionCache()
+
+        # Viewer used to render reference images, and cache of rendered images
+        self.renderer = renderer or MaterialXRenderer()
+        self.render_cache = render_cache or ConversionCache()
+
+        super().__init__(homePage, max_workers, worker_type, max_queued_jobs)
+
+        # Load the standard libraries up front so that the first request
+        # does not pay for library loading.
+        if warmup:
+            nodedef_count = warmStandardLibrary()
+            print(f'* Loaded standard libraries: {nodedef_count} definitions')
+
+    def _register_routes(self):
+        '''
+        Register HTTP routes.
+        '''
+        super()._register_routes()
+
+        @self.app.route('/cache/stats')
+        def cache_stats():
+            '''
+            Return conversion cache statistics.
+            '''
+            return jsonify(self.conversion_cache.stats())
+
+        @self.app.route('/render/stats')
+        def render_stats():
+            '''
+            Return render queue statistics.
+            '''
+            stats = self.renderer.stats()
+            stats['cache'] = self.render_cache.stats()
+            return jsonify(stats)
 
     def _setup_event_handler_map(self):
         '''
@@ -116,7 +357,7 @@ class MaterialXConversionApp(MaterialXFlaskApp):
         Handle page load / startup feedback
         '''
         status = '> Using MaterialX version: ' + mx.getVersionString()
-        emit('materialx_version', {'status': status}, broadcast=True)
+        self._emit_to_client('materialx_version', {'status': status})
 
     def handle_load_materialx(self, data):
         '''
@@ -131,73 +372,65 @@ class MaterialXConversionApp(MaterialXFlaskApp):
         mx.readFromXmlString(doc, materialx_content)
         print('>> MaterialX Document loaded')
         doc_string = mx.writeToXmlString(doc)
-        emit('materialx_loaded', {'materialxDocument': doc_string}, broadcast=True)
+        self._emit_to_client('materialx_loaded', {'materialxDocument': doc_string})
 
     def handle_render_materialx(self, data):
         '''
-        Handle request to render MaterialX document
+        Handle request to render MaterialX document.
+        If the viewer is not available or the render size is invalid, a 'job_done' event
+        with a status of 'rejected' and a 'reason' message is emitted.
         '''
         materialx_string = data.get('materialxDocument', 'MaterialX content')
         print('> Server: render_materialx event received')
-
-        # Get environment variable: MATERIALX_DEFAULT_VIEWER
-        ilm_viewer = os.getenv('MATERIALX_DEFAULT_VIEWER', '')
-        if len(ilm_viewer) == 0:
-            print('>> MATERIALX_DEFAULT_VIEWER environment variable not set')
-            return
-
-        doc = mx.createDocument()
         if len(materialx_string) == 0:
             return
+        if not self.renderer.is_available():
+            reason = 'MATERIALX_DEFAULT_VIEWER environment variable not set'
+            print('>>', reason)
+            emit('job_done', {'jobId': None, 'event': 'materialx_rendered', 'status': 'rejected', 'reason': reason})
+            return
+        try:
+            width = MaterialXConversionApp._get_render_size(data.get('width'))
+            height = MaterialXConversionApp._get_render_size(data.get('height'))
+        except (TypeError, ValueError) as e:
+            reason = f'Invalid render size: {e}'
+            print('>>', reason)
+            emit('job_done', {'jobId': None, 'event': 'materialx_rendered', 'status': 'rejected', 'reason': reason})
+            return
 
-        stdlib = mx.createDocument()
-        mx.loadLibraries(mx.getDefaultDataLibraryFolders(), mx.getDefaultDataSearchPath(), stdlib)
-        doc.importLibrary(stdlib)
-        mx.readFromXmlString(doc, materialx_string)
+        # The document is read and the render cache checked in the job, so that this
+        # handler does not parse the document. Rendering runs the viewer in its own
+        # process so it is not sent to the process pool.
+        self.submit_job('materialx_rendered', self.render_materialx, (materialx_string, width, height), None,
+                        use_process_pool=False)
 
-        # Get platform temporary folder location
-        temp_location = os.getenv('TEMP', '/tmp')
-        if not os.path.exists(temp_location):
-            temp_location = '/tmp'
-        # Generate a temp file name based on the current date and time
-        temp_name = datetime.datetime.now().strftime('%Y%m%d%H%M%S') + '.mtlx'
-        temp_file = f'{temp_location}/{temp_name}'
-        mx.writeToXmlFile(doc, temp_file)
-        capture_filename = temp_file.replace(".mtlx", ".png")
-        cmd = f'{ilm_viewer} --screenWidth 512 --screenHeight 512 '
-        cmd += f' --captureFilename {capture_filename} --material {temp_file}'
-        print('>> Rendering:', cmd)
-        os.system(cmd)
-        # Delete the temp files
-        os.remove(temp_file)
-
-        image_base64 = self.convert_png_to_base64(capture_filename)
-        os.remove(capture_filename)
-        print('>> Emit materialx_rendered event')
-        emit('materialx_rendered', {'image': image_base64}, broadcast=True)
+    @staticmethod
+    def _get_render_size(value):
+        '''
+        Return a render width or height from request data, using the default size if not set.
+        '''
+        if value is None:
+            return DEFAULT_RENDER_SIZE
+        size = int(value)
+        if size < RENDER_SIZE_RANGE[0] or size > RENDER_SIZE_RANGE[1]:
+            raise ValueError(f'{size} is outside of {RENDER_SIZE_RANGE[0]}..{RENDER_SIZE_RANGE[1]}')
+        return size
 
     def handle_convert_to_usd(self, data):
         '''
         Handle request to convert MaterialX to USD
         '''
         if not have_usd_converter:
-            emit('usd_converted', {'usdDocument': ''}, broadcast=True)
+            self._emit_to_client('usd_converted', {'usdDocument': ''})
             return
 
         materialx_string = data.get('materialxDocument', '')
         print('> Server: convert-to-usd event received')
-        doc = mx.createDocument()
         if len(materialx_string) == 0:
             return
-        try:
-            mx.readFromXmlString(doc, materialx_string)
-            print('>> MaterialX document loaded')
-            stage_string = convertMtlxToUsd(doc, True)
-            print('>> USD stage created.')
-            emit('usd_converted', {'usdDocument': stage_string}, broadcast=True)
-        except Exception as e:
-            print(f'>> Error during USD conversion: {e}')
-            emit('usd_converted', {'usdDocument': ''}, broadcast=True)
+        self._submit_cached_conversion('usd_converted', MaterialXConversionApp.convert_to_usd, materialx_string,
+                                       'usd', {'emitAllValueElements': True}, {'usd': usd_version},
+                                       {'usdDocument': ''})
 
     def handle_convert_to_glTF(self, data):
         '''
@@ -205,40 +438,89 @@ class MaterialXConversionApp(MaterialXFlaskApp):
         graph
         '''
         if not have_gltf_converter:
-            emit('gltf_converted', {'document': '{}'}, broadcast=True)
+            self._emit_to_client('gltf_converted', {'document': '{}'})
             return
 
         materialx_string = data.get('materialxDocument', '')
         print('> Server: convert_to_glTF event received')
-        stdlib, _ = MxGLTFPTUtil.load_standard_libraries()
-        doc = MxGLTFPTUtil.create_working_document([stdlib])
         if len(materialx_string) == 0:
             return
+        self._submit_cached_conversion('gltf_converted', MaterialXConversionApp.convert_to_glTF, materialx_string,
+                                       'gltf', {}, {'gltf': gltf_version},
+                                       {'document': '{}'})
+
+    def _submit_cached_conversion(self, result_event, job_function, materialx_string, converter, options, versions, error_result):
+        '''
+        Emit a cached conversion result if available, otherwise submit a conversion
+        job and cache its result.
+        '''
+        versions['materialx'] = mx.getVersionString()
+        key = ConversionCache.make_key(materialx_string, converter, options, versions)
+        result = self.conversion_cache.get(key)
+        if result is not None:
+            print(f'>> Using cached {converter} conversion')
+            self._emit_to_client(result_event, result)
+            return
+        self.submit_job(result_event, job_function, (materialx_string,), error_result,
+                        lambda result: self.conversion_cache.put(key, result))
+
+    def render_materialx(self, materialx_string, width=DEFAULT_RENDER_SIZE, height=DEFAULT_RENDER_SIZE):
+        '''
+        Job to render a MaterialX document. Returns the 'materialx_rendered' event data.
+        The document is read once. Rendered images are cached by the document as written by
+        MaterialX, so that formatting differences do not cause the same document to be rendered again.
+        '''
+        doc = mx.createDocument()
+        mx.readFromXmlString(doc, materialx_string)
+        options = {'width': width, 'height': height}
+        versions = {'viewer': self.renderer.identity(), 'materialx': mx.getVersionString()}
+        key = ConversionCache.make_key(mx.writeToXmlString(doc), 'render', options, versions)
+        result = self.render_cache.get(key)
+        if result is not None:
+            print('>> Using cached render')
+            return result
+
+        doc.importLibrary(getStandardLibrary())
+        image = self.renderer.render(mx.writeToXmlString(doc), width, height)
+        result = {'image': base64.b64encode(image).decode('utf-8')}
+        self.render_cache.put(key, result)
+        print('>> Emit materialx_rendered event')
+        return result
+
+    @staticmethod
+    def convert_to_usd(materialx_string):
+        '''
+        Job to convert a MaterialX document to USD. Returns the 'usd_converted' event data.
+        '''
+        doc = mx.createDocument()
+        mx.readFromXmlString(doc, materialx_string)
+        print('>> MaterialX document loaded')
+        stage_string = convertMtlxToUsd(doc, True)
+        print('>> USD stage created.')
+        return {'usdDocument': stage_string}
+
+    @staticmethod
+    def convert_to_glTF(materialx_string):
+        '''
+        Job to convert a MaterialX document to glTF. Returns the 'gltf_converted' event data.
+        Raises an exception if the conversion fails so that the failure is not cached.
+        '''
+        stdlib, _ = MxGLTFPTUtil.load_standard_libraries()
+        doc = MxGLTFPTUtil.create_working_document([stdlib])
         mx.readFromXmlString(doc, materialx_string)
         print('>> MaterialX document loaded')
         converter = MxGLTFPT.glTFMaterialXConverter()
         json_string, status = converter.materialX_to_glTF(doc)
         if not json_string:
-            print('>> Error converting to glTF:', status)
-            json_string = '{}'
+            raise RuntimeError(f'Error converting to glTF: {status}')
         print('>> glTF JSON created:')
-        emit('gltf_converted', {'document': json_string}, broadcast=True)
+        return {'document': json_string}
 
     def handle_have_gltf_converter(self):
         '''
         Handle query to see if glTF converter is available
         '''
-        emit('have_gltf_converter', {'have_gltf_converter': have_gltf_converter}, broadcast=True)
-
-    @staticmethod
-    def convert_png_to_base64(file_path):
-        '''
-        Utility to load in png image from disk and return Base64 
-        representation
-        '''
-        with open(file_path, "rb") as image_file:
-            binary_data = image_file.read()
-            return base64.b64encode(binary_data).decode('utf-8')
+        self._emit_to_client('have_gltf_converter', {'have_gltf_converter': have_gltf_converter})
 
 def deployment_platform():
     # Small detection setup to determine the platform
@@ -261,6 +543,19 @@ def main():
     parser.add_argument('--host', type=str, default='127.0.0.1', help="Host address to run the server on (default: 127.0.0.1)")
     parser.add_argument('--port', type=int, default=None, help="Port to run the server on (default: 8000)")
     parser.add_argument('--home', type=str, default='MaterialXConversionApp.html', help="Home page.")
+    parser.add_argument('--no-warmup', action='store_true', help="Load MaterialX libraries on first request instead of at startup.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of conversion and render workers (default: number of CPUs)")
+    parser.add_argument('--worker-type', type=str, default='thread', choices=['thread', 'process'], help="Run jobs on worker threads or processes (default: thread)")
+    parser.add_argument('--max-queued-jobs', type=int, default=32, help="Maximum number of pending jobs before new requests are rejected (default: 32)")
+    parser.add_argument('--cache-size', type=int, default=64, help="In-memory conversion cache size in megabytes (default: 64)")
+    parser.add_argument('--cache-dir', type=str, default=None, help="Folder for the on-disk conversion cache. Disabled if not set.")
+    parser.add_argument('--cache-disk-size', type=int, default=512, help="On-disk conversion cache size in megabytes (default: 512)")
+    parser.add_argument('--viewer', type=str, default=None, help="Viewer command used for rendering (default: MATERIALX_DEFAULT_VIEWER environment variable)")
+    parser.add_argument('--max-renderers', type=int, default=2, help="Maximum number of viewer processes running at once (default: 2)")
+    parser.add_argument('--render-timeout', type=int, default=120, help="Seconds after which a render is stopped (default: 120)")
+    parser.add_argument('--render-cache-size', type=int, default=64, help="In-memory render cache size in megabytes (default: 64)")
+    parser.add_argument('--render-cache-dir', type=str, default=None, help="Folder for the on-disk render cache. Disabled if not set.")
+    parser.add_argument('--render-cache-disk-size', type=int, default=512, help="On-disk render cache size in megabytes (default: 512)")
 
     args = parser.parse_args()
 
@@ -275,7 +570,12 @@ def main():
     if args.port is not None:
         app_port = args.port
 
-    app = MaterialXConversionApp(args.home)
+    conversion_cache = ConversionCache(args.cache_size * 1024 * 1024, args.cache_dir, args.cache_disk_size * 1024 * 1024)
+    renderer = MaterialXRenderer(args.viewer, args.max_renderers, args.render_timeout)
+    render_cache = ConversionCache(args.render_cache_size * 1024 * 1024, args.render_cache_dir, args.render_cache_disk_size * 1024 * 1024)
+    app = MaterialXConversionApp(args.home, warmup=not args.no_warmup, max_workers=args.workers,
+                                 worker_type=args.worker_type, max_queued_jobs=args.max_queued_jobs,
+                                 conversion_cache=conversion_cache, renderer=renderer, render_cache=render_cache)
     app.run(host=app_host, port=app_port, deployment_platform=deployment_platform)
 
 if __name__ == "__main__":
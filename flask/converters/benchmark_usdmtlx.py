@@ -0,0 +1,103 @@
+'''
+Benchmark for usdmtlx conversion on a large synthetic node graph.
+
+Compares UsdShade and Sdf authoring of the whole graph, and resolving 
+connections by querying the Usd stage for each connection against using 
+the lookup table built while defining prims.
+'''
+import argparse
+import time
+
+import MaterialX as mx
+from pxr import Usd
+
+import usdmtlx
+from mtlxstdlib import getStandardLibrary
+
+def createSyntheticDocument(nodeCount):
+    '''
+    Create a document with a material whose shader is fed by a nodegraph
+    containing a chain of nodeCount nodes.
+    '''
+    doc = mx.createDocument()
+    nodegraph = doc.addNodeGraph('NG_synthetic')
+    scale = nodegraph.addInput('scale', 'float')
+    scale.setValue(0.5)
+
+    previous = None
+    for i in range(nodeCount):
+        node = nodegraph.addNode('multiply', f'multiply_{i}', 'float')
+        in1 = node.addInput('in1', 'float')
+        if previous:
+            in1.setNodeName(previous.getName())
+        else:
+            in1.setValue(1.0)
+        in2 = node.addInput('in2', 'float')
+        in2.setInterfaceName(scale.getName())
+        previous = node
+
+    output = nodegraph.addOutput('out', 'float')
+    output.setNodeName(previous.getName())
+
+    shader = doc.addNode('standard_surface', 'SR_synthetic', 'surfaceshader')
+    baseInput = shader.addInput('base', 'float')
+    baseInput.setNodeGraphString(nodegraph.getName())
+    baseInput.setOutputString(output.getName())
+
+    doc.addMaterialNode('M_synthetic', shader)
+    return doc
+
+def timeConnections(stage, connections, usdNodes, repeat):
+    '''
+    Time emitting connections for a list of (element, root path) pairs.
+    '''
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for elem, rootPath in connections:
+            usdmtlx.emitUsdConnections(elem, stage, rootPath, usdNodes)
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark usdmtlx conversion of a large synthetic node graph")
+    parser.add_argument('--nodes', type=int, default=2000, help="Number of nodes in the node graph (default: 2000)")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of timing repetitions (default: 3)")
+    args = parser.parse_args()
+
+    getStandardLibrary()
+
+    for useSdf in [False, True]:
+        doc = createSyntheticDocument(args.nodes)
+        start = time.perf_counter()
+        usdmtlx.convertMtlxToUsd(doc, True, useSdf)
+        backend = 'Sdf' if useSdf else 'UsdShade'
+        print(f'Convert {args.nodes} nodes using {backend} authoring: {time.perf_counter() - start:.3f} seconds')
+
+    # Rebuild the stage and connection list so that the connection pass can be timed in isolation
+    doc = createSyntheticDocument(args.nodes)
+    mxnodes = usdmtlx.findMaterialXNodes(doc)
+    doc.importLibrary(getStandardLibrary())
+    stage = Usd.Stage.CreateInMemory()
+    usdmtlx.emitUsdShaderGraph(doc, stage, mxnodes, False)
+
+    materialPath = '/M_synthetic/'
+    connections = []
+    for elem in mxnodes.values():
+        if elem.getType() == 'material':
+            connections.append((elem, '/'))
+        elif elem.isA(mx.Node) or elem.isA(mx.NodeGraph):
+            connections.append((elem, materialPath))
+    usdNodes = {}
+    for prim in stage.Traverse():
+        usdNode = usdmtlx.getUsdShadeNode(prim)
+        if usdNode:
+            usdNodes[str(prim.GetPath())] = usdNode
+
+    stageTime = timeConnections(stage, connections, None, args.repeat)
+    tableTime = timeConnections(stage, connections, usdNodes, args.repeat)
+    print(f'Connections using stage queries: {stageTime:.3f} seconds')
+    print(f'Connections using lookup table : {tableTime:.3f} seconds')
+    if tableTime > 0:
+        print(f'Speedup: {stageTime / tableTime:.2f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''
+Content-addressed cache of conversion results.
+
+Results are keyed by a hash of the input document, the converter used, its
+options and the versions of the libraries involved. Entries are kept in an
+in-memory LRU tier and optionally in a size-bounded on-disk tier so that
+results survive server restarts. Each result is stored as one JSON file.
+'''
+import hashlib
+import json
+
+from tieredcache import TieredCache
+
+def _resultSize(result):
+    '''
+    Approximate size in bytes of a result dictionary.
+    '''
+    return sum(len(str(value)) for value in result.values())
+
+class ConversionCache(TieredCache):
+    '''
+    Two tier (memory and disk) cache of conversion results.
+    Results are dictionaries of JSON serializable values.
+    '''
+    extensions = ('.json',)
+
+    def __init__(self, max_memory_bytes=64 * 1024 * 1024, cache_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        '''
+        Constructor
+        @param max_memory_bytes Size budget for the in-memory tier.
+        @param cache_dir Folder for the on-disk tier. If not set, only the memory tier is used.
+        @param max_disk_bytes Size budget for the on-disk tier.
+        '''
+        super().__init__(max_memory_bytes, cache_dir, max_disk_bytes)
+
+    @staticmethod
+    def make_key(document, converter, options=None, versions=None):
+        '''
+        Create a cache key.
+        @param document The input document string.
+        @param converter Name of the converter. e.g. 'usd', 'gltf'
+        @param options Dictionary of converter options.
+        @param versions Dictionary of library versions used for conversion.
+        @return Hex digest key.
+        '''
+        header = json.dumps({
+            'converter': converter,
+            'options': options or {},
+            'versions': versions or {}
+        }, sort_keys=True)
+        hasher = hashlib.sha256(header.encode('utf-8'))
+        hasher.update(b'\0')
+        hasher.update(document.encode('utf-8'))
+        return hasher.hexdigest()
+
+    def _entry_size(self, result):
+        return _resultSize(result)
+
+    def _serialize(self, result):
+        return [json.dumps(result).encode('utf-8')]
+
+    def _deserialize(self, key, contents):
+        return json.loads(contents[0].decode('utf-8'))
@@ -0,0 +1,173 @@
+'''
+Render job subsystem for the MaterialX viewer.
+
+Each render runs the viewer as a subprocess in its own temporary folder so that
+concurrent renders do not share files. The number of viewer processes running
+at once is bounded, and renders which exceed a timeout are terminated.
+
+The viewer is any command which accepts the MaterialXView arguments
+--screenWidth, --screenHeight, --captureFilename and --material, and writes a
+PNG image to the capture file.
+'''
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+class RenderError(Exception):
+    '''
+    Raised when the viewer fails, times out or does not write an image.
+    '''
+    pass
+
+class MaterialXRenderer:
+    '''
+    Runs renders on a bounded number of viewer subprocesses.
+    '''
+    def __init__(self, viewer=None, max_renderers=2, timeout=120, temp_dir=None):
+        '''
+        Constructor
+        @param viewer The viewer command line. If not set, MATERIALX_DEFAULT_VIEWER is used.
+        @param max_renderers Maximum number of viewer processes running at once.
+        @param timeout Seconds after which a viewer process is terminated.
+        @param temp_dir Folder in which per-render temporary folders are created.
+        If not set, the platform temporary folder is used.
+        '''
+        self.viewer = viewer if viewer is not None else os.getenv('MATERIALX_DEFAULT_VIEWER', '')
+        self.max_renderers = max(1, max_renderers)
+        self.timeout = timeout
+        self.temp_dir = temp_dir
+
+        self.slots = threading.BoundedSemaphore(self.max_renderers)
+        self.lock = threading.Lock()
+
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    def is_available(self):
+        '''
+        Return True if a viewer is set.
+        '''
+        return bool(self.viewer)
+
+    def identity(self):
+        '''
+        Return a string identifying the viewer binary and its settings. It changes when the
+        viewer command line, the viewer binary, or MATERIALX_ environment variables change,
+        since any of these can change the rendered image.
+        '''
+        arguments = shlex.split(self.viewer)
+        if not arguments:
+            return ''
+        binary = shutil.which(arguments[0]) or arguments[0]
+        try:
+            stat = os.stat(binary)
+            binary = f'{os.path.realpath(binary)}:{stat.st_size}:{stat.st_mtime_ns}'
+        except OSError:
+            pass
+        environment = sorted((name, value) for name, value in os.environ.items() if name.startswith('MATERIALX_'))
+        return repr((binary, arguments[1:], environment))
+
+    def make_command(self, material_path, capture_path, width, height):
+        '''
+        Create the viewer command line for a render.
+        @return List of command line arguments.
+        '''
+        return shlex.split(self.viewer) + [
+            '--screenWidth', str(width), '--screenHeight', str(height),
+            '--captureFilename', capture_path, '--material', material_path
+        ]
+
+    def render(self, materialx_string, width=512, height=512):
+        '''
+        Render a MaterialX document. Waits for a free renderer if the maximum
+        number of viewer processes are already running.
+        @param materialx_string The MaterialX document to render.
+        @param width The image width.
+        @param height The image height.
+        @return PNG image bytes.
+        '''
+        if not self.is_available():
+            raise RenderError('No viewer set')
+
+        with self.lock:
+            self.queued += 1
+        self.slots.acquire()
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+
+        status = 'failed'
+        try:
+            image = self._run_viewer(materialx_string, width, height)
+            status = 'completed'
+            return image
+        except subprocess.TimeoutExpired:
+            status = 'timed_out'
+            raise RenderError(f'Render timed out after {self.timeout} seconds')
+        finally:
+            self.slots.release()
+            with self.lock:
+                self.running -= 1
+                if status == 'completed':
+                    self.completed += 1
+                elif status == 'timed_out':
+                    self.timed_out += 1
+                else:
+                    self.failed += 1
+
+    def _run_viewer(self, materialx_string, width, height):
+        '''
+        Run the viewer in a new temporary folder and return the captured image.
+        '''
+        with tempfile.TemporaryDirectory(prefix='mx_render_', dir=self.temp_dir) as work_dir:
+            material_path = os.path.join(work_dir, 'material.mtlx')
+            capture_path = os.path.join(work_dir, 'capture.png')
+            with open(material_path, 'w', encoding='utf-8') as f:
+                f.write(materialx_string)
+
+            cmd = self.make_command(material_path, capture_path, width, height)
+            print('>> Rendering:', ' '.join(shlex.quote(arg) for arg in cmd))
+            start = time.perf_counter()
+            try:
+                process = subprocess.Popen(cmd, cwd=work_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            except OSError as e:
+                raise RenderError(f'Failed to start viewer: {e}')
+            try:
+                output, _ = process.communicate(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise
+
+            if process.returncode != 0:
+                message = output.decode('utf-8', errors='replace').strip().splitlines()[-1:]
+                raise RenderError(f'Viewer exited with code {process.returncode}. {" ".join(message)}')
+            try:
+                with open(capture_path, 'rb') as f:
+                    image = f.read()
+            except OSError:
+                raise RenderError('Viewer did not write an image')
+            print(f'>> Rendered in {time.perf_counter() - start:.2f} seconds')
+            return image
+
+    def stats(self):
+        '''
+        Return render queue statistics.
+        '''
+        with self.lock:
+            return {
+                'viewer': self.viewer,
+                'maxRenderers': self.max_renderers,
+                'queued': self.queued,
+                'running': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timedOut': self.timed_out
+            }
@@ -0,0 +1,79 @@
+'''
+Process-wide cache of the MaterialX standard data libraries.
+
+Loading the standard libraries is the most expensive part of handling a small
+document, so the loaded library document is kept per
+(library folders, search path, MaterialX version) and shared by all callers.
+The cached document must be treated as read-only: callers should only
+import it into their own working documents.
+'''
+import threading
+
+import MaterialX as mx
+
+_stdlibCache = {}
+_stdlibLock = threading.Lock()
+
+# Functions which clear caches derived from the standard library documents
+_dependentCacheClearFunctions = []
+
+def _libraryKey(libraryFolders, searchPath):
+    '''
+    Build the cache key for a given set of library folders and search path.
+    '''
+    return (tuple(libraryFolders), searchPath.asString(), mx.getVersionString())
+
+def getStandardLibrary(libraryFolders=None, searchPath=None):
+    """
+    Return the shared standard library document, loading it on first use.
+
+    Parameters:
+    -----------
+    - libraryFolders : list
+        Library folders to load. Defaults to mx.getDefaultDataLibraryFolders()
+    - searchPath : mx.FileSearchPath
+        Search path for library folders. Defaults to mx.getDefaultDataSearchPath()
+    """
+    if libraryFolders is None:
+        libraryFolders = mx.getDefaultDataLibraryFolders()
+    if searchPath is None:
+        searchPath = mx.getDefaultDataSearchPath()
+
+    key = _libraryKey(libraryFolders, searchPath)
+    stdlib = _stdlibCache.get(key)
+    if stdlib is not None:
+        return stdlib
+
+    with _stdlibLock:
+        # Another thread may have loaded the library while waiting on the lock
+        stdlib = _stdlibCache.get(key)
+        if stdlib is None:
+            stdlib = mx.createDocument()
+            mx.loadLibraries(libraryFolders, searchPath, stdlib)
+            _stdlibCache[key] = stdlib
+    return stdlib
+
+def warmStandardLibrary(libraryFolders=None, searchPath=None):
+    """
+    Load the standard library ahead of the first request.
+    Returns the number of nodedefs loaded.
+    """
+    stdlib = getStandardLibrary(libraryFolders, searchPath)
+    return len(stdlib.getNodeDefs())
+
+def registerDependentCache(clearFunction):
+    """
+    Register a function which clears a cache derived from the standard library
+    documents, e.g. of nodedef data. It is called by clearStandardLibraryCache().
+    """
+    if clearFunction not in _dependentCacheClearFunctions:
+        _dependentCacheClearFunctions.append(clearFunction)
+
+def clearStandardLibraryCache():
+    """
+    Drop all cached standard library documents, and all caches derived from them.
+    """
+    with _stdlibLock:
+        _stdlibCache.clear()
+        for clearFunction in _dependentCacheClearFunctions:
+            clearFunction()
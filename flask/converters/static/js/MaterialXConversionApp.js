@@ -9,6 +9,9 @@ export class MaterialX_Conversion_Client extends WebSocketClient {
         this.usdEditor = null;
         this.gltfEditor = null;
 
+        // Server jobs which have not completed yet. Keyed by job id.
+        this.pendingJobs = {};
+
         this.setupEventHandlers = this.setupEventHandlers.bind(this);
         this.setupXML = this.setupXML.bind(this);
     }
@@ -38,6 +41,21 @@ export class MaterialX_Conversion_Client extends WebSocketClient {
         }
     }
 
+    cancelJob(jobId)
+    {
+        if (jobId in this.pendingJobs) {
+            console.log('Web: Emitting cancel_job event:', jobId);
+            this.socket.emit('cancel_job', { jobId: jobId });
+        }
+    }
+
+    cancelAllJobs()
+    {
+        for (const jobId in this.pendingJobs) {
+            this.cancelJob(jobId);
+        }
+    }
+
     setupEventHandlers() 
     {
         let app = this;
@@ -71,7 +89,9 @@ export class MaterialX_Conversion_Client extends WebSocketClient {
 
         document.getElementById('renderMTLXButton').addEventListener('click', function () {
             console.log('Web: Emitting render_mtlx event');
-            app.socket.emit('render_materialx', { materialxDocument: document.getElementById('mtlxOutput').value });
+            const size = parseInt(document.getElementById('renderSize').value, 10);
+            app.socket.emit('render_materialx', { materialxDocument: document.getElementById('mtlxOutput').value,
+                                                  width: size, height: size });
         });
         this.socket.on('materialx_rendered', function (data) {
             app.handleImageRendered(data);
@@ -97,6 +117,16 @@ export class MaterialX_Conversion_Client extends WebSocketClient {
             app.glTFEditor.setValue(data.document);
         });
 
+        // Server job status
+        this.socket.on('job_progress', function (data) {
+            console.log('WEB: job_progress event:', data.event, data.status, 'Queued jobs:', data.queued);
+            app.pendingJobs[data.jobId] = data;
+        });
+        this.socket.on('job_done', function (data) {
+            console.log('WEB: job_done event:', data.event, data.status, data.reason || '');
+            delete app.pendingJobs[data.jobId];
+        });
+
         // Handle Python status messages
         this.socket.on('materialx_version', function (data) {
             console.log('WEB: materialx_version event:', data.status);
@@ -1,6 +1,27 @@
 import MaterialX as mx
 from pxr import Usd, UsdShade, Sdf, UsdGeom, Gf
 
+from mtlxstdlib import getStandardLibrary, registerDependentCache
+
+# Mapping from MaterialX types to Usd Sdf types.
+# Types not in this table are mapped to tokens.
+MTLX_USD_TYPE_MAP = {
+    'filename': Sdf.ValueTypeNames.Asset,
+    'string': Sdf.ValueTypeNames.String,
+    'boolean': Sdf.ValueTypeNames.Bool,
+    'integer': Sdf.ValueTypeNames.Int,
+    'float': Sdf.ValueTypeNames.Float,
+    'color3': Sdf.ValueTypeNames.Color3f,
+    'color4': Sdf.ValueTypeNames.Color4f,
+    'vector2': Sdf.ValueTypeNames.Float2,
+    'vector3': Sdf.ValueTypeNames.Vector3f,
+    'vector4': Sdf.ValueTypeNames.Float4,
+    'surfaceshader': Sdf.ValueTypeNames.Token
+}
+
+# Cache of nodedef schemas keyed by (source URI, nodedef name)
+_nodeDefSchemaCache = {}
+
 def mapMtlxToUsdShaderNotation(name):
     '''
     Utility to map from a MaterialX shader notation to Usd.
@@ -14,19 +35,48 @@ def mapMtlxToUsdShaderNotation(name):
         name = 'volume'
     return name
 
-def emitUsdConnections(node, stage, rootPath):
-    """ 
-    Emit connections between MaterialX elements as Usd connections for 
-    a given MaterialX node.
+def getUsdShadeNode(prim):
+    """
+    Return a Usd prim as a UsdShade Material, NodeGraph or Shader.
+    Returns None if the prim is not valid or is not one of these types.
+    """
+    if not prim:
+        return None
+    if prim.IsA(UsdShade.Material): 
+        return UsdShade.Material(prim)
+    elif prim.IsA(UsdShade.NodeGraph):
+        return UsdShade.NodeGraph(prim)
+    elif prim.IsA(UsdShade.Shader): 
+        return UsdShade.Shader(prim)
+    return None
+
+def findUsdShadeNode(stage, usdNodes, path):
+    """
+    Find the UsdShade node at a given path. 
+    If a lookup table is provided it is used instead of querying the stage.
+    """
+    if usdNodes is not None:
+        return usdNodes.get(path)
+    return getUsdShadeNode(stage.GetPrimAtPath(path))
+
+def getMtlxConnections(node, rootPath):
+    """
+    Get the upstream connections of the inputs and outputs of a MaterialX node 
+    in Usd path notation.
 
     Paramters:
     - node : 
         MaterialX node to examine
-    - stage :
-        Usd stage to write connection to
+    - rootPath :
+        Usd path prefix for the node
+
+    Returns a list of tuples of the form:
+    (value element, is input, interface name, candidate source paths, source port)
+    where the candidate source paths are to be searched in order.
     """
+    connections = []
     if not node:
-        return
+        return connections
     
     materialPath = None
     if node.getType() == 'material':
@@ -87,85 +137,87 @@ def emitUsdConnections(node, stage, rootPath):
                         else:
                             connectionPath = rootPath + mtlxConnection
 
-                # Find the source prim
-                # Assumes that the source is either a nodegraph, a material or a shader
+                # Assumes that the source is either a nodegraph, a material or a shader.
+                # For materials the source may also be found under the material prim.
                 connectionPath = connectionPath.removesuffix('/')
-                sourcePrim = None
-                sourcePort = 'out'
-                source = stage.GetPrimAtPath(connectionPath)
-                if not source:
-                    if materialPath:
-                        connectionPath = '/' + materialPath + connectionPath
-                        source = stage.GetPrimAtPath(connectionPath)
-                        if not source:
-                            source = stage.GetPrimAtPath('/' + materialPath)
-                if source:
-                    if source.IsA(UsdShade.Material): 
-                        sourcePrim = UsdShade.Material(source)
-                    elif source.IsA(UsdShade.NodeGraph):
-                        sourcePrim = UsdShade.NodeGraph(source)
-                    elif source.IsA(UsdShade.Shader): 
-                        sourcePrim = UsdShade.Shader(source)
-
-                    # Special case handle interface input vs an output
-                    if interfacename:
-                        sourcePort =  interfacename
-                    else:                          
-                        sourcePort = valueElement.getAttribute('output')
-                        if not sourcePort:
-                            sourcePort = 'out'
-                    if sourcePort:
-                        mtlxConnection = mtlxConnection + '. Port:' + sourcePort
+                sourcePaths = [connectionPath]
+                if materialPath:
+                    sourcePaths.append('/' + materialPath + connectionPath)
+                    sourcePaths.append('/' + materialPath)
 
-                else:
-                    print('> Failed to find source at path:', connectionPath)
-
-                # Find destination prim and port and make the appropriate connection.
-                # Assumes that the destination is either a nodegraph, a material or a shader
-                destInput = None
-                if sourcePrim:
-                    dest = stage.GetPrimAtPath(rootPath + node.getNamePath())
-                    if not dest:
-                        print('> Failed to find dest at path:', rootPath + node.getNamePath())
-                    else:
-                        destPort = None
-                        portName = valueElement.getName()
-                        destNode = None
-                        if dest.IsA(UsdShade.Material): 
-                            destNode = UsdShade.Material(dest)
-                        elif dest.IsA(UsdShade.NodeGraph):
-                            destNode = UsdShade.NodeGraph(dest)
-                        elif dest.IsA(UsdShade.Shader): 
-                            destNode = UsdShade.Shader(dest)
-                        else:
-                            print('> Encountered unsupport destinion type')
-
-                        # Find downstream port (input or output)
-                        if destNode:
-                            if isInput:
-                                # Map from MaterialX to Usd connection syntax
-                                if dest.IsA(UsdShade.Material):
-                                    portName = mapMtlxToUsdShaderNotation(portName)
-                                    portName = 'mtlx:' + portName
-                                    destPort = destNode.GetOutput(portName) 
-                                else:
-                                    destPort = destNode.GetInput(portName) 
-                            else:
-                                destPort = destNode.GetOutput(portName)                                
-
-                        # Make connection to interface input, or node/nodegraph output
-                        if destPort:
-                            if interfacename:
-                                interfaceInput = sourcePrim.GetInput(sourcePort) 
-                                if interfaceInput:
-                                    if not destPort.ConnectToSource(interfaceInput):
-                                        print('> Failed to connect: ', source.GetPrimPath(), '-->', destPort.GetFullName())
-                            else:
-                                sourcePrimAPI = sourcePrim.ConnectableAPI()
-                                if not destPort.ConnectToSource(sourcePrimAPI, sourcePort):
-                                    print('> Failed to connect: ', source.GetPrimPath(), '-->', destPort.GetFullName())
-                        else:
-                            print('> Failed to find destination port:', portName)
+                # Special case handle interface input vs an output
+                if interfacename:
+                    sourcePort =  interfacename
+                else:                          
+                    sourcePort = valueElement.getAttribute('output')
+                    if not sourcePort:
+                        sourcePort = 'out'
+
+                connections.append((valueElement, isInput, interfacename, sourcePaths, sourcePort))
+
+    return connections
+
+def emitUsdConnections(node, stage, rootPath, usdNodes=None):
+    """ 
+    Emit connections between MaterialX elements as Usd connections for 
+    a given MaterialX node.
+
+    Paramters:
+    - node : 
+        MaterialX node to examine
+    - stage :
+        Usd stage to write connection to
+    - rootPath :
+        Usd path prefix for the node
+    - usdNodes :
+        Optional dictionary of Usd paths to UsdShade nodes to use for
+        lookups instead of querying the stage.
+    """
+    for valueElement, isInput, interfacename, sourcePaths, sourcePort in getMtlxConnections(node, rootPath):
+
+        # Find the source prim
+        sourcePrim = None
+        for connectionPath in sourcePaths:
+            sourcePrim = findUsdShadeNode(stage, usdNodes, connectionPath)
+            if sourcePrim:
+                break
+        if not sourcePrim:
+            print('> Failed to find source at path:', sourcePaths[0])
+            continue
+
+        # Find destination prim and port and make the appropriate connection.
+        # Assumes that the destination is either a nodegraph, a material or a shader
+        destNode = findUsdShadeNode(stage, usdNodes, rootPath + node.getNamePath())
+        if not destNode:
+            print('> Failed to find dest at path:', rootPath + node.getNamePath())
+            continue
+
+        # Find downstream port (input or output)
+        portName = valueElement.getName()
+        if isInput:
+            # Map from MaterialX to Usd connection syntax
+            if isinstance(destNode, UsdShade.Material):
+                portName = mapMtlxToUsdShaderNotation(portName)
+                portName = 'mtlx:' + portName
+                destPort = destNode.GetOutput(portName) 
+            else:
+                destPort = destNode.GetInput(portName) 
+        else:
+            destPort = destNode.GetOutput(portName)                                
+
+        # Make connection to interface input, or node/nodegraph output
+        if destPort:
+            if interfacename:
+                interfaceInput = sourcePrim.GetInput(sourcePort) 
+                if interfaceInput:
+                    if not destPort.ConnectToSource(interfaceInput):
+                        print('> Failed to connect: ', sourcePrim.GetPath(), '-->', destPort.GetFullName())
+            else:
+                sourcePrimAPI = sourcePrim.ConnectableAPI()
+                if not destPort.ConnectToSource(sourcePrimAPI, sourcePort):
+                    print('> Failed to connect: ', sourcePrim.GetPath(), '-->', destPort.GetFullName())
+        else:
+            print('> Failed to find destination port:', portName)
 
 
 def mapMtxToUsdType(mtlxType):
@@ -177,22 +229,7 @@ def mapMtxToUsdType(mtlxType):
     - mtxType : string
         MaterialX type 
     """
-    mtlxUsdMap = dict()
-    mtlxUsdMap['filename'] = Sdf.ValueTypeNames.Asset
-    mtlxUsdMap['string'] = Sdf.ValueTypeNames.String
-    mtlxUsdMap['boolean'] = Sdf.ValueTypeNames.Bool
-    mtlxUsdMap['integer'] = Sdf.ValueTypeNames.Int
-    mtlxUsdMap['float'] = Sdf.ValueTypeNames.Float
-    mtlxUsdMap['color3'] = Sdf.ValueTypeNames.Color3f
-    mtlxUsdMap['color4'] = Sdf.ValueTypeNames.Color4f
-    mtlxUsdMap['vector2'] = Sdf.ValueTypeNames.Float2    
-    mtlxUsdMap['vector3'] = Sdf.ValueTypeNames.Vector3f    
-    mtlxUsdMap['vector4'] = Sdf.ValueTypeNames.Float4    
-    mtlxUsdMap['surfaceshader'] = Sdf.ValueTypeNames.Token
-
-    if mtlxType in mtlxUsdMap:
-        return mtlxUsdMap[mtlxType]
-    return Sdf.ValueTypeNames.Token
+    return MTLX_USD_TYPE_MAP.get(mtlxType, Sdf.ValueTypeNames.Token)
 
 def mapMtxToUsdValue(mtlxType, mtlxValue):
     """
@@ -219,6 +256,52 @@ def mapMtxToUsdValue(mtlxType, mtlxValue):
 
     return usdValue
 
+def getNodeDefSchema(nodedef):
+    """
+    Get the Usd schema for the inputs and outputs of a nodedef.
+
+    Schemas of library nodedefs are cached by source URI and name for the 
+    lifetime of the process. Nodedefs defined in the document being converted
+    are not cached.
+
+    Returns a list of tuples of the form:
+    (is input, port name, Usd type, Usd default value or None)
+    """
+    sourceUri = nodedef.getActiveSourceUri()
+    cacheable = sourceUri and sourceUri != nodedef.getDocument().getSourceUri()
+    key = (sourceUri, nodedef.getName())
+    if cacheable:
+        schema = _nodeDefSchemaCache.get(key)
+        if schema is not None:
+            return schema
+
+    schema = []
+    for valueElement in nodedef.getActiveValueElements():
+        if valueElement.isA(mx.Input):
+            mtlxType = valueElement.getType()
+            usdValue = None
+            if len(valueElement.getValueString()) > 0:
+                usdValue = mapMtxToUsdValue(mtlxType, valueElement.getValue())
+                if usdValue == '__':
+                    usdValue = None
+            schema.append((True, valueElement.getName(), mapMtxToUsdType(mtlxType), usdValue))
+        elif valueElement.isA(mx.Output):
+            schema.append((False, valueElement.getName(), mapMtxToUsdType(valueElement.getType()), None))
+        else:
+            print('- Skip mapping of definition element: ', valueElement.getName(), '. Type: ', valueElement.getCategory())
+
+    if cacheable:
+        _nodeDefSchemaCache[key] = schema
+    return schema
+
+def clearNodeDefSchemaCache():
+    """
+    Clear the cache of nodedef schemas. Called when the standard library cache is cleared.
+    """
+    _nodeDefSchemaCache.clear()
+
+registerDependentCache(clearNodeDefSchemaCache)
+
 def emitUsdValueElements(node, usdNode, emitAllValueElements):
     """
     Emit MaterialX value elements in Usd.
@@ -241,26 +324,14 @@ def emitUsdValueElements(node, usdNode, emitAllValueElements):
     # Note that outputs are always created.
     nodedef = node.getNodeDef()
     if nodedef and not isMaterial:
-        for valueElement in nodedef.getActiveValueElements():
-            if valueElement.isA(mx.Input):
+        for isInput, portName, usdType, usdValue in getNodeDefSchema(nodedef):
+            if isInput:
                 if emitAllValueElements:
-                    mtlxType = valueElement.getType()
-                    usdType = mapMtxToUsdType(mtlxType)
-
-                    portName = valueElement.getName()
                     usdInput = usdNode.CreateInput(portName, usdType)
-
-                    if len(valueElement.getValueString()) > 0:
-                        mtlxValue = valueElement.getValue()
-                        usdValue = mapMtxToUsdValue(mtlxType, mtlxValue)
-                        if usdValue != '__':
-                            usdInput.Set(usdValue)
-
-            elif not isMaterial and valueElement.isA(mx.Output):
-                usdOutput = usdNode.CreateOutput(valueElement.getName(), mapMtxToUsdType(valueElement.getType()))
-
+                    if usdValue is not None:
+                        usdInput.Set(usdValue)
             else:
-                print('- Skip mapping of definition element: ', valueElement.getName(), '. Type: ', valueElement.getCategory())
+                usdNode.CreateOutput(portName, usdType)
 
     # From the given instance add inputs and outputs and set values.
     # This may override the default value specified on the definition.
@@ -300,91 +371,310 @@ def moveChild(newParent, child):
     oldParent = child.getParent()
     oldParent.removeChild(child.getName())
 
-def emitUsdShaderGraph(doc, stage, mxnodes, emitAllValueElements):
+def getUsdShaderGraphPrims(doc, mxnodes):
     """
-    Emit Usd shader graph to a given stage from a list of MaterialX nodes.
+    Get the Usd prims to create for a list of MaterialX nodes.
 
     Parameters
     ------------    
     doc: 
         MaterialX source document
-    stage:
-        Usd target stage
     mxnodes:
-        MaterialX shader nodes.
-    emitAllValueElements: bool
-        Emit value elements based on node definition, even if not specified on node instance.      
+        MaterialX shader nodes. Either a dictionary of name paths to elements as
+        returned by findMaterialXNodes(), or a list of name paths.
+
+    Returns a list of tuples of the form:
+    (element, Usd schema type name, Usd path, nodedef, connection root path)
+    where the connection root path is None if connections are not emitted for the element.
     """
-    materialPath = None
-    print('Stage:', stage)
-    if not stage:
-        return
+    if not isinstance(mxnodes, dict):
+        mxnodes = { v : doc.getDescendant(v) for v in mxnodes }
+    elements = list(mxnodes.values())
 
-    for v in mxnodes:
-        elem = doc.getDescendant(v)
+    materialPath = None
+    for elem in elements:
         if elem.getType() == 'material':    
             materialPath = elem.getName()
             break
-            
-    # Emit Usd nodes
-    for v in mxnodes:
-        elem = doc.getDescendant(v)
+
+    prims = []
+    for elem in elements:
 
         # Note that MaterialX does not use absolute path notation while Usd
         # does. This will result in an error when trying set the path
         usdPath = '/' + elem.getNamePath()
 
         nodeDef = None
-        usdNode = None
+        connectionRoot = None
+        elemPath = usdPath
         if elem.getType() == 'material':
-            usdNode = UsdShade.Material.Define(stage, usdPath)                
+            usdType = 'Material'
+            connectionRoot = '/'
         elif elem.isA(mx.Node):
+            usdType = 'Shader'
             nodeDef = elem.getNodeDef()
-            if materialPath:
-                elemPath = '/' + materialPath + usdPath
-            else:
-                elemPath = usdPath
-            usdNode = UsdShade.Shader.Define(stage, elemPath)
         elif elem.isA(mx.NodeGraph):
-            if materialPath:
-                elemPath = '/' + materialPath + usdPath
-            else:
-                elemPath = usdPath
-            usdNode = UsdShade.NodeGraph.Define(stage, elemPath)
+            usdType = 'NodeGraph'
+        else:
+            continue
+
+        if materialPath and usdType != 'Material':
+            elemPath = '/' + materialPath + usdPath
+            connectionRoot = '/' + materialPath + '/'
+
+        prims.append((elem, usdType, elemPath, nodeDef, connectionRoot))
+
+    return prims
+
+def emitUsdShaderGraph(doc, stage, mxnodes, emitAllValueElements):
+    """
+    Emit Usd shader graph to a given stage from a list of MaterialX nodes.
+
+    Parameters
+    ------------    
+    doc: 
+        MaterialX source document
+    stage:
+        Usd target stage
+    mxnodes:
+        MaterialX shader nodes. Either a dictionary of name paths to elements as
+        returned by findMaterialXNodes(), or a list of name paths.
+    emitAllValueElements: bool
+        Emit value elements based on node definition, even if not specified on node instance.      
+    """
+    print('Stage:', stage)
+    if not stage:
+        return
+
+    usdDefine = {
+        'Material': UsdShade.Material.Define,
+        'Shader': UsdShade.Shader.Define,
+        'NodeGraph': UsdShade.NodeGraph.Define
+    }
+
+    # Lookup table of Usd paths to the UsdShade nodes defined,
+    # and the list of (element, root path) pairs to emit connections for.
+    usdNodes = {}
+    connections = []
+
+    # Emit Usd nodes
+    for elem, usdType, elemPath, nodeDef, connectionRoot in getUsdShaderGraphPrims(doc, mxnodes):
+        usdNode = usdDefine[usdType](stage, elemPath)
+        if connectionRoot:
+            connections.append((elem, connectionRoot))
 
         if usdNode:
+            usdNodes[elemPath] = usdNode
             if nodeDef:
                 usdNode.SetShaderId(nodeDef.getName())
             emitUsdValueElements(elem, usdNode, emitAllValueElements)
 
     # Emit connections between Usd nodes
-    for v in mxnodes:
-        elem = doc.getDescendant(v)
-        usdPath = '/' + elem.getNamePath()
+    for elem, rootPath in connections:
+        emitUsdConnections(elem, stage, rootPath, usdNodes)
 
-        if elem.getType() == 'material':
-            emitUsdConnections(elem, stage, '/')                
-        elif elem.isA(mx.Node):
-            if materialPath:
-                emitUsdConnections(elem, stage, '/' + materialPath + '/')                
-        elif elem.isA(mx.NodeGraph):
-            if materialPath:
-                emitUsdConnections(elem, stage, '/' + materialPath + '/')     
+def defineSdfPrim(layer, path, typeName=''):
+    """
+    Define a prim spec and any missing ancestor prim specs in a layer.
+    This authors the same specs as the UsdShade Define() methods.
+    """
+    path = Sdf.Path(path)
+    primSpec = layer.GetPrimAtPath(path)
+    if primSpec:
+        primSpec.specifier = Sdf.SpecifierDef
+    else:
+        parentPath = path.GetParentPath()
+        if parentPath == Sdf.Path.absoluteRootPath:
+            parentSpec = layer.pseudoRoot
+        else:
+            parentSpec = defineSdfPrim(layer, parentPath)
+        primSpec = Sdf.PrimSpec(parentSpec, path.name, Sdf.SpecifierDef)
+    if typeName:
+        primSpec.typeName = typeName
+    return primSpec
+
+def createSdfAttribute(primSpec, name, usdType, variability=Sdf.VariabilityVarying):
+    """
+    Return the attribute spec with a given name, creating it if it does not exist.
+    """
+    attrSpec = primSpec.attributes.get(name)
+    if not attrSpec:
+        attrSpec = Sdf.AttributeSpec(primSpec, name, usdType, variability)
+    return attrSpec
+
+def setSdfValue(attrSpec, mtlxType, valueElement):
+    """
+    Set the default value of an attribute spec from a MaterialX value element.
+    """
+    # Set value. Note that we check the length of the value string
+    # instead of getValue() as a 0 value will be skipped.
+    if len(valueElement.getValueString()) > 0:
+        usdValue = mapMtxToUsdValue(mtlxType, valueElement.getValue())
+        if usdValue != '__':
+            attrSpec.default = usdValue
+
+def emitSdfValueElements(node, primSpec, emitAllValueElements):
+    """
+    Emit MaterialX value elements as Sdf attribute specs.
+    This is the Sdf equivalent of emitUsdValueElements().
+
+    Parameters
+    ------------    
+    node: 
+        MaterialX node with value elements to scan
+    primSpec:
+        Sdf prim spec to create attributes on.
+    emitAllValueElements: bool
+        Emit value elements based on node definition, even if not specified on node instance.      
+    """
+    if not node:
+        return    
+    
+    isMaterial = node.getType() == 'material'
+ 
+    # Instantiate with all the nodedef inputs (if emitAllValueELements is True).
+    # Note that outputs are always created.
+    nodedef = node.getNodeDef()
+    if nodedef and not isMaterial:
+        for isInput, portName, usdType, usdValue in getNodeDefSchema(nodedef):
+            if isInput:
+                if emitAllValueElements:
+                    attrSpec = createSdfAttribute(primSpec, 'inputs:' + portName, usdType)
+                    if usdValue is not None:
+                        attrSpec.default = usdValue
+            else:
+                createSdfAttribute(primSpec, 'outputs:' + portName, usdType)
+
+    # From the given instance add inputs and outputs and set values.
+    # This may override the default value specified on the definition.
+    for valueElement in node.getActiveValueElements():
+        if valueElement.isA(mx.Input):
+            mtlxType = valueElement.getType()
+            if isMaterial:
+                # Map from Materials to Usd notation
+                attrName = 'outputs:mtlx:' + mapMtlxToUsdShaderNotation(valueElement.getName())
+            else:
+                attrName = 'inputs:' + valueElement.getName()
+            attrSpec = createSdfAttribute(primSpec, attrName, mapMtxToUsdType(mtlxType))
+            setSdfValue(attrSpec, mtlxType, valueElement)
+
+        elif not isMaterial and valueElement.isA(mx.Output):
+            if not primSpec.attributes.get('inputs:' + valueElement.getName()):
+                createSdfAttribute(primSpec, 'outputs:' + valueElement.getName(), mapMtxToUsdType(valueElement.getType()))
+
+        else:
+            print('- Skip mapping of element: ', valueElement.getNamePath(), '. Type: ', valueElement.getCategory())
+
+def emitSdfConnections(node, rootPath, primSpecs):
+    """ 
+    Emit connections between MaterialX elements as Sdf connections for 
+    a given MaterialX node. 
+    This is the Sdf equivalent of emitUsdConnections().
+
+    Paramters:
+    - node : 
+        MaterialX node to examine
+    - rootPath :
+        Usd path prefix for the node
+    - primSpecs :
+        Dictionary of Usd paths to the prim specs defined
+    """
+    for valueElement, isInput, interfacename, sourcePaths, sourcePort in getMtlxConnections(node, rootPath):
+
+        # Find the source prim
+        sourceSpec = None
+        for connectionPath in sourcePaths:
+            sourceSpec = primSpecs.get(connectionPath)
+            if sourceSpec:
+                break
+        if not sourceSpec:
+            print('> Failed to find source at path:', sourcePaths[0])
+            continue
+
+        destSpec = primSpecs.get(rootPath + node.getNamePath())
+        if not destSpec:
+            print('> Failed to find dest at path:', rootPath + node.getNamePath())
+            continue
+
+        # Find downstream port (input or output)
+        portName = valueElement.getName()
+        if isInput:
+            # Map from MaterialX to Usd connection syntax
+            if destSpec.typeName == 'Material':
+                portName = 'mtlx:' + mapMtlxToUsdShaderNotation(portName)
+                destAttr = destSpec.attributes.get('outputs:' + portName)
+            else:
+                destAttr = destSpec.attributes.get('inputs:' + portName)
+        else:
+            destAttr = destSpec.attributes.get('outputs:' + portName)
+        if not destAttr:
+            print('> Failed to find destination port:', portName)
+            continue
+
+        # Make connection to interface input, or node/nodegraph output.
+        # As with UsdShade, a missing source output is created with the destination type.
+        if interfacename:
+            sourceAttr = sourceSpec.attributes.get('inputs:' + sourcePort)
+            if not sourceAttr:
+                continue
+        else:
+            sourceAttr = createSdfAttribute(sourceSpec, 'outputs:' + sourcePort, destAttr.typeName)
+        destAttr.connectionPathList.ClearEditsAndMakeExplicit()
+        destAttr.connectionPathList.explicitItems.append(sourceAttr.path)
+
+def emitSdfShaderGraph(doc, layer, mxnodes, emitAllValueElements):
+    """
+    Emit Usd shader graph to a given layer from a list of MaterialX nodes
+    by authoring Sdf specs directly. The output is the same as for emitUsdShaderGraph().
+
+    Parameters
+    ------------    
+    doc: 
+        MaterialX source document
+    layer:
+        Sdf target layer
+    mxnodes:
+        MaterialX shader nodes. Either a dictionary of name paths to elements as
+        returned by findMaterialXNodes(), or a list of name paths.
+    emitAllValueElements: bool
+        Emit value elements based on node definition, even if not specified on node instance.      
+    """
+    # Lookup table of Usd paths to the prim specs defined,
+    # and the list of (element, root path) pairs to emit connections for.
+    primSpecs = {}
+    connections = []
+
+    # Emit Usd nodes
+    for elem, usdType, elemPath, nodeDef, connectionRoot in getUsdShaderGraphPrims(doc, mxnodes):
+        primSpec = defineSdfPrim(layer, elemPath, usdType)
+        primSpecs[elemPath] = primSpec
+        if connectionRoot:
+            connections.append((elem, connectionRoot))
+        if nodeDef:
+            idAttr = createSdfAttribute(primSpec, 'info:id', Sdf.ValueTypeNames.Token, Sdf.VariabilityUniform)
+            idAttr.default = nodeDef.getName()
+        emitSdfValueElements(elem, primSpec, emitAllValueElements)
+
+    # Emit connections between Usd nodes
+    for elem, rootPath in connections:
+        emitSdfConnections(elem, rootPath, primSpecs)
 
 def findMaterialXNodes(doc):
     """
     Find all nodes in a MaterialX document
+
+    Returns a dictionary of name paths to elements in traversal order.
     """
-    visitedNodes = []
+    visitedNodes = {}
     treeIter = doc.traverseTree()
     for elem in treeIter:
         path = elem.getNamePath()
         if path in visitedNodes:
             continue
-        visitedNodes.append(path)
+        visitedNodes[path] = elem
     return visitedNodes
 
-def convertMtlxToUsd(doc, emitAllValueElements):
+def convertMtlxToUsd(doc, emitAllValueElements, useSdf=False):
     """
     Read in a MaterialX file and emit it to a new Usd Stage
     Dump results for display and save to usda file.
@@ -395,8 +685,10 @@ def convertMtlxToUsd(doc, emitAllValueElements):
         Name of file containing MaterialX document. Assumed to end in ".mtlx"
      emitAllValueElements: bool
         Emit value elements based on node definition, even if not specified on node instance.         
+     useSdf: bool
+        Author Sdf specs directly in a single change block instead of using the UsdShade API.
+        This is faster for large documents and produces the same output.
     """
-    stage = Usd.Stage.CreateInMemory()
     
     #doc = mx.createDocument()
     #mtlxFilePath = mx.FilePath(mtlxFileName)
@@ -407,11 +699,16 @@ def convertMtlxToUsd(doc, emitAllValueElements):
     # Find nodes to transform before importing the definition library
     #mx.readFromXmlFile(doc, mtlxFileName)
     mxnodes = findMaterialXNodes(doc)
-    stdlib = mx.createDocument()
-    libFiles = []
-    searchPath = mx.getDefaultDataSearchPath()
-    libFiles = mx.loadLibraries(mx.getDefaultDataLibraryFolders(), searchPath, stdlib)
+    stdlib = getStandardLibrary()
     doc.importLibrary(stdlib)
+
+    if useSdf:
+        layer = Sdf.Layer.CreateAnonymous('.usda')
+        with Sdf.ChangeBlock():
+            emitSdfShaderGraph(doc, layer, mxnodes, emitAllValueElements)
+        return layer.ExportToString()
+
+    stage = Usd.Stage.CreateInMemory()
     
     # Translate
     emitUsdShaderGraph(doc, stage, mxnodes, emitAllValueElements)        
@@ -0,0 +1,185 @@
+'''
+Command line batch conversion of MaterialX files to USD.
+
+Converts a list of MaterialX files, folders or glob patterns to .usda or .usdc
+files using a process pool. Per-file results are written as JSON lines as each
+file completes. Files with an output newer than the input are skipped.
+'''
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+def findMaterialXFiles(inputs):
+    """
+    Find MaterialX files from a list of files, folders and glob patterns.
+
+    Returns a list of (input file, root folder) pairs, where the root folder
+    is used to determine the relative output location.
+    """
+    files = []
+    visited = set()
+    for inputPath in inputs:
+        if os.path.isdir(inputPath):
+            root = inputPath
+            matches = []
+            for folder, _, fileNames in os.walk(inputPath):
+                matches.extend(os.path.join(folder, f) for f in fileNames if f.endswith('.mtlx'))
+            matches.sort()
+        elif os.path.isfile(inputPath):
+            root = os.path.dirname(inputPath)
+            matches = [inputPath]
+        else:
+            # Use the folder before the first wildcard as the root
+            rootParts = []
+            for part in inputPath.split(os.sep):
+                if any(c in part for c in '*?['):
+                    break
+                rootParts.append(part)
+            root = os.sep.join(rootParts)
+            matches = sorted(glob.glob(inputPath, recursive=True))
+
+        for match in matches:
+            if not match.endswith('.mtlx') or not os.path.isfile(match):
+                continue
+            absPath = os.path.abspath(match)
+            if absPath in visited:
+                continue
+            visited.add(absPath)
+            files.append((match, root))
+    return files
+
+def getOutputPath(inputPath, root, outputFolder, extension):
+    """
+    Get the USD output path for an input MaterialX file.
+    If an output folder is given, the folder structure below the root is preserved.
+    """
+    baseName = os.path.splitext(inputPath)[0] + extension
+    if not outputFolder:
+        return baseName
+    return os.path.join(outputFolder, os.path.relpath(baseName, root or '.'))
+
+def isUpToDate(inputPath, outputPath):
+    """
+    Return True if the output exists and is newer than the input.
+    """
+    try:
+        return os.path.getmtime(outputPath) >= os.path.getmtime(inputPath)
+    except OSError:
+        return False
+
+def convertFile(inputPath, outputPath, emitAllValueElements, useSdf):
+    """
+    Convert a single MaterialX file to USD. Runs in a worker process.
+
+    Returns a result dictionary for the report.
+    """
+    import MaterialX as mx
+    from pxr import Sdf
+    from usdmtlx import convertMtlxToUsd
+
+    result = { 'input': inputPath, 'output': outputPath }
+    start = time.perf_counter()
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            doc = mx.createDocument()
+            mx.readFromXmlFile(doc, inputPath)
+            stageString = convertMtlxToUsd(doc, emitAllValueElements, useSdf)
+
+        os.makedirs(os.path.dirname(os.path.abspath(outputPath)), exist_ok=True)
+        if outputPath.endswith('.usda'):
+            with open(outputPath, 'w', encoding='utf-8') as f:
+                f.write(stageString)
+        else:
+            layer = Sdf.Layer.CreateAnonymous('.usda')
+            layer.ImportFromString(stageString)
+            if not layer.Export(outputPath):
+                raise RuntimeError(f'Failed to export: {outputPath}')
+        result['status'] = 'converted'
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+
+    # Conversion failures are reported by usdmtlx as lines starting with '>'
+    warnings = [line for line in log.getvalue().splitlines() if line.startswith('>')]
+    if warnings:
+        result['warnings'] = warnings
+    result['seconds'] = round(time.perf_counter() - start, 4)
+    return result
+
+def convertFiles(files, outputFolder, extension, emitAllValueElements, useSdf, force, jobs, report):
+    """
+    Convert files using a process pool and write a JSON line per file to the report.
+
+    Returns a dictionary of counts per status.
+    """
+    counts = { 'converted': 0, 'skipped': 0, 'failed': 0 }
+
+    def writeResult(result):
+        counts[result['status']] += 1
+        report.write(json.dumps(result) + '\n')
+        report.flush()
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        for inputPath, root in files:
+            outputPath = getOutputPath(inputPath, root, outputFolder, extension)
+            if not force and isUpToDate(inputPath, outputPath):
+                writeResult({ 'input': inputPath, 'output': outputPath, 'status': 'skipped' })
+                continue
+            future = executor.submit(convertFile, inputPath, outputPath, emitAllValueElements, useSdf)
+            futures[future] = (inputPath, outputPath)
+
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself failed
+                inputPath, outputPath = futures[future]
+                result = { 'input': inputPath, 'output': outputPath, 'status': 'failed', 'error': str(e) }
+            writeResult(result)
+
+    return counts
+
+def main():
+    '''
+    Main command line interface
+    '''
+    parser = argparse.ArgumentParser(description="Batch convert MaterialX files to USD")
+    parser.add_argument('inputs', nargs='+', help="MaterialX files, folders or glob patterns to convert. Folders are searched recursively.")
+    parser.add_argument('-o', '--output', type=str, default=None, help="Output folder. If not set, files are written next to the input files.")
+    parser.add_argument('-f', '--format', type=str, default='usda', choices=['usda', 'usdc'], help="Output file format (default: usda)")
+    parser.add_argument('-r', '--report', type=str, default=None, help="JSON lines report file (default: standard output)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument('--force', action='store_true', help="Convert files even if the output is newer than the input.")
+    parser.add_argument('--instance-inputs-only', action='store_true', help="Only emit inputs specified on node instances instead of all nodedef inputs.")
+    parser.add_argument('--usdshade', action='store_true', help="Author using the UsdShade API instead of writing Sdf specs directly.")
+
+    args = parser.parse_args()
+
+    files = findMaterialXFiles(args.inputs)
+    if not files:
+        print('No MaterialX files found', file=sys.stderr)
+        return 1
+
+    report = open(args.report, 'w', encoding='utf-8') if args.report else sys.stdout
+    start = time.perf_counter()
+    try:
+        counts = convertFiles(files, args.output, '.' + args.format, not args.instance_inputs_only,
+                              not args.usdshade, args.force, args.jobs, report)
+    finally:
+        if args.report:
+            report.close()
+
+    print(f"Converted: {counts['converted']}. Skipped: {counts['skipped']}. Failed: {counts['failed']}. "
+          f"Time: {time.perf_counter() - start:.2f} seconds", file=sys.stderr)
+    return 1 if counts['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,14 +3,22 @@
 @brief A Flask application that connects with the GPUOpen MaterialX server to allow downloading and extracting of materials by regular expression.
 '''
 import argparse
+import io
+import os
+import re
 import sys
-from flask import Flask, render_template
-import json
-from flask_socketio import SocketIO, emit
-from materialxMaterials import GPUOpenLoader as gpuo
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, render_template, request, send_file, abort
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from gpuopencatalog import GPUOpenCatalogCache, GPUOpenCatalogService
+from gpuopenpackagecache import GPUOpenPackageCache, read_package_file, read_package_file_chunks
 have_mx = False
 try:
     import MaterialX as mx
+    from mtlxupgradecache import MaterialXUpgradeCache
     have_mx = True
 except ImportError as e:
     print("MaterialX module not found.")
@@ -33,6 +41,15 @@ class MaterialXFlaskApp:
         self.app = Flask(__name__)
         self.socketio = SocketIO(self.app)
 
+        # Shared room joined by each client session. Responses are sent to all
+        # clients in the room if the requesting client joined one, and otherwise
+        # only to the requesting client.
+        self.client_rooms = {}
+
+        # Connected client sessions. Guarded together with client_rooms by client_lock.
+        self.connected_clients = set()
+        self.client_lock = threading.Lock()
+
         # Register routes and events
         self._register_routes()
         self._setup_event_handler_map()
@@ -63,6 +80,109 @@ class MaterialXFlaskApp:
         # Dynamically register event handlers
         for event_name, handler in self.event_handlers.items():
             self.socketio.on_event(event_name, handler)        
+        self.socketio.on_event('connect', self.handle_connect)
+        self.socketio.on_event('join_room', self.handle_join_room)
+        self.socketio.on_event('leave_room', self.handle_leave_room)
+        self.socketio.on_event('disconnect', self.handle_disconnect)
+
+    def handle_connect(self, auth=None):
+        '''
+        Record a connected client session.
+        '''
+        with self.client_lock:
+            self.connected_clients.add(request.sid)
+
+    def handle_join_room(self, data):
+        '''
+        Handle request to join a shared room. Responses to requests from any client
+        in the room are sent to all clients in the room. Rooms named after a connected
+        client session are rejected, as joining one would receive that client's responses.
+        '''
+        room = data.get('room', '')
+        if not room:
+            return
+        with self.client_lock:
+            if room in self.connected_clients:
+                rejected = True
+            else:
+                rejected = False
+                previous_room = self.client_rooms.get(request.sid)
+                self.client_rooms[request.sid] = room
+        if rejected:
+            emit('room_rejected', { 'room': room })
+            return
+        if previous_room:
+            leave_room(previous_room)
+        join_room(room)
+        emit('room_joined', { 'room': room })
+
+    def handle_leave_room(self, data):
+        '''
+        Handle request to leave the shared room. Responses are then only sent to the client.
+        '''
+        with self.client_lock:
+            room = self.client_rooms.pop(request.sid, None)
+        if room:
+            leave_room(room)
+        emit('room_left', { 'room': room })
+
+    def handle_disconnect(self, reason=None):
+        '''
+        Remove a disconnected client session and its room.
+        '''
+        with self.client_lock:
+            self.connected_clients.discard(request.sid)
+            self.client_rooms.pop(request.sid, None)
+
+    def _client_target(self):
+        '''
+        Return the recipient of responses to the current request: the shared room
+        of the requesting client if it joined one, otherwise the client session.
+        Must be called from within a SocketIO event handler.
+        '''
+        with self.client_lock:
+            return self.client_rooms.get(request.sid, request.sid)
+
+    def _emit_to_client(self, event, data, to=None):
+        '''
+        Emit a response to the requesting client, or to all clients in its shared room.
+        @param event The event name.
+        @param data The event data.
+        @param to The recipient returned by _client_target(). Required when called
+        outside of a SocketIO event handler.
+        '''
+        self.socketio.emit(event, data, to=to or self._client_target())
+
+    def _emit_acknowledged(self, event, data, sid, to):
+        '''
+        Emit a response which the requesting client session acknowledges on receipt. Other clients in
+        its shared room are sent the response without an acknowledgement, as acknowledgements
+        are only supported for responses to a single client.
+        @param event The event name.
+        @param data The event data.
+        @param sid The requesting client session.
+        @param to The recipient returned by _client_target().
+        @return threading.Event which is set when the client session acknowledges the response.
+        '''
+        delivered = threading.Event()
+        self.socketio.emit(event, data, to=sid, callback=lambda *args: delivered.set())
+        if to != sid:
+            self.socketio.emit(event, data, to=to, skip_sid=sid)
+        return delivered
+
+    @staticmethod
+    def _wait_for_delivery(pending, window, timeout):
+        '''
+        Wait until at most 'window' responses are not yet acknowledged.
+        @param pending Deque of the events returned by _emit_acknowledged(), oldest first.
+        @param window The number of responses which may be unacknowledged.
+        @param timeout Time in seconds to wait for each acknowledgement.
+        @return False if a response was not acknowledged in time, e.g. as the client disconnected.
+        '''
+        while len(pending) > window:
+            if not pending.popleft().wait(timeout):
+                return False
+        return True
 
     def run(self, host, port, debug=True):
         '''
@@ -79,18 +199,120 @@ class MaterialXGPUOpenApp(MaterialXFlaskApp):
     A Flask application that connects with the GPUOpen MaterialX server to allow downloading 
     and extracting of materials by regular expression.    
     '''
-    def __init__(self, homePage):
+    # Maximum size in bytes of each file chunk sent to the client
+    EXTRACT_CHUNK_SIZE = 256 * 1024
+
+    # Number of file chunks sent to the client before waiting for it to acknowledge receiving them,
+    # and the time in seconds to wait for each acknowledgement
+    EXTRACT_CHUNK_WINDOW = 4
+    DELIVERY_TIMEOUT = 30
+
+    # Allowed range of thumbnail sizes in pixels
+    THUMBNAIL_SIZE_RANGE = (16, 1024)
+
+    # Maximum number of materials extracted for one expression
+    MAX_EXTRACT_MATERIALS = 32
+
+    def __init__(self, homePage, catalog_dir=None, catalog_ttl=24 * 60 * 60, package_cache=None,
+                 extract_workers=4, max_downloads=2, upgrade_cache=None):
         '''
         Initialize the Flask application and the MaterialX loader.
         @param homePage The home page template to render.
+        @param catalog_dir Folder to persist the material catalogue to. If not set, the catalogue is only kept in memory.
+        @param catalog_ttl Time in seconds before the material catalogue is refreshed from the server.
+        @param package_cache GPUOpenPackageCache for extracted packages. If not set, a memory only cache is used.
+        @param extract_workers Number of materials which are extracted in parallel.
+        @param max_downloads Maximum number of concurrent package downloads from the GPUOpen server.
+        @param upgrade_cache MaterialXUpgradeCache for upgraded MaterialX documents. If not set, a memory only cache is used.
         '''
         super().__init__(homePage)
 
-        # Material loader and associated attributes
-        self.loader = None
-        self.materials = None
-        self.material_names = None
-        self.material_count = 0
+        # Local catalogue of materials. Loaded from disk so that it can be served
+        # without waiting on the server.
+        self.catalog = GPUOpenCatalogCache(catalog_dir, catalog_ttl)
+        loaded = self.catalog.load()
+
+        # Catalogues shared by all clients
+        self.catalog_service = GPUOpenCatalogService(self.catalog)
+
+        # Catalogue source ('server' or 'package') selected by each client session with 'download_materialx'.
+        # Guarded by client_lock.
+        self.client_sources = {}
+        if loaded:
+            snapshot = self.catalog_service.publish_cached()
+            print(f'Loaded material catalogue from: {catalog_dir}. Materials: {snapshot.material_count}')
+
+        # Downloaded and extracted packages shared by all clients
+        self.package_cache = package_cache or GPUOpenPackageCache()
+
+        # Pool for per material extraction work, shared by all clients. 
+        # Downloads are further limited to avoid overloading the GPUOpen server.
+        self.extract_executor = ThreadPoolExecutor(max_workers=max(1, extract_workers))
+        self.download_semaphore = threading.BoundedSemaphore(max(1, max_downloads))
+
+        # MaterialX documents upgraded to the current version, shared by all clients
+        self.upgrade_cache = None
+        if have_mx:
+            self.upgrade_cache = upgrade_cache or MaterialXUpgradeCache()
+
+    def upgrade_cached_packages(self):
+        '''
+        @brief Upgrade the MaterialX documents of all packages in the on-disk package cache,
+        so that later extractions with upgrade enabled only need a cache lookup.
+        @return Tuple of the number of documents upgraded and the number already upgraded.
+        '''
+        upgraded_count = 0
+        cached_count = 0
+        if not self.upgrade_cache:
+            return upgraded_count, cached_count
+        for package in self.package_cache.disk_entries():
+            for item in package['files']:
+                if item['type'] != 'mtlx':
+                    continue
+                try:
+                    _, cached = self.upgrade_cache.upgrade(read_package_file(package, item['file_name']).decode('utf-8'))
+                except mx.Exception as e:
+                    print(f'Failed to upgrade {item["file_name"]} in package for: {package["title"]}. Error: {e}')
+                    continue
+                if cached:
+                    cached_count += 1
+                else:
+                    upgraded_count += 1
+        return upgraded_count, cached_count
+
+    def _register_routes(self):
+        '''
+        Register HTTP routes.
+        '''
+        super()._register_routes()
+
+        @self.app.route('/thumbnail')
+        def thumbnail():
+            """
+            Return a PNG thumbnail of an image in a material package.
+            Query parameters are: title, file, size (default 256) and source, the catalogue
+            the material is from ('server' or 'package'). Thumbnails are created on first request and cached.
+            """
+            title = request.args.get('title', '')
+            file_name = request.args.get('file', '')
+            source = request.args.get('source')
+            if source not in (None, 'server', 'package'):
+                abort(400)
+            try:
+                size = int(request.args.get('size', 256))
+            except ValueError:
+                abort(400)
+            size = min(max(size, self.THUMBNAIL_SIZE_RANGE[0]), self.THUMBNAIL_SIZE_RANGE[1])
+
+            snapshot = self.catalog_service.current(source)
+            position = snapshot.find_title(title) if snapshot else None
+            if position is None:
+                abort(404)
+            package, _ = self._get_package(snapshot, position)
+            image = self.package_cache.get_thumbnail(package, file_name, size) if package else None
+            if image is None:
+                abort(404)
+            return send_file(io.BytesIO(image), mimetype='image/png', max_age=24 * 60 * 60)
 
     def _emit_status_message(self, message):
         '''
@@ -99,74 +321,232 @@ class MaterialXGPUOpenApp(MaterialXFlaskApp):
 
         @param message The status message to emit. 
         '''
-        emit('materialx_status', { 'message': message }, broadcast=True)
+        self._emit_to_client('materialx_status', { 'message': message })
         print('Python:', message)
 
+    def handle_disconnect(self, reason=None):
+        '''
+        Remove a disconnected client session, its room and its catalogue selection.
+        '''
+        super().handle_disconnect(reason)
+        with self.client_lock:
+            self.client_sources.pop(request.sid, None)
+
+    def _client_snapshot(self):
+        '''
+        @brief Get the published catalogue snapshot for the source selected by the requesting client session.
+        Must be called from within a SocketIO event handler.
+        @return A GPUOpenCatalogSnapshot, or None if no catalogue has been loaded.
+        '''
+        with self.client_lock:
+            source = self.client_sources.get(request.sid)
+        return self.catalog_service.current(source)
+
     def handle_download_materialx(self, data):
         '''
-        @brief Handle the 'download_materialx' event, initialize the loader, and send materials data to the client.
-        Data is of the form:
+        @brief Handle the 'download_materialx' event, load the shared catalogue, and send a summary to the client.
+        Material results are fetched a page at a time using the 'query_materials' event.
+        Data emitted is of the form:
         { 'materialCount': int, 
-          'materialNames': list of strings, 
-          'materialsList': list of material data in JSON format 
+          'categories': list of category strings
         }
-        @param data The data received from the client (not used in this handler).
-
+        @param data The data received from the client, optionally containing:
+        { 'frompackage': bool, 'refresh': bool }
+        where 'refresh' forces a check for catalogue changes on the server.
         '''
         status_message = f'Downloaded materials...'
         self._emit_status_message(status_message)
 
-        # Initialize the loader and fetch materials
-        self.loader = gpuo.GPUOpenMaterialLoader()
+        # Get the shared catalogue. Concurrent requests share a single fetch.
         from_package = data.get('frompackage', False)
-        if from_package:
-            self.loader.readPackageFiles()
-        else:
-            # Download vs package...
-            self.materials = self.loader.getMaterials()
-            self.loader.getRenders()
-        self.material_names = self.loader.getMaterialNames()
-
-        # Convert materials to JSON and add preview URLs
-        materials_list = []
-        merged_results = { "results": [] }
-        for mat_json in self.loader.getMaterialsAsJsonString():
-            mat_obj = json.loads(mat_json)
-            # Add preview URL for each result
-            results = mat_obj.get('results', [])
-            for result in results:
-                title = result.get('title')
-                result['url'] = self.loader.getMaterialPreviewURL(title)
-                merged_results["results"].append(result)
-
-        # Sort list by title
-        merged_results["results"].sort(key=lambda x: x.get('title', ''))
-        materials_list.append(json.dumps(merged_results, indent=2))
-
-        self.material_count = len(self.material_names)
+        force_refresh = data.get('refresh', False)
+        snapshot = self.catalog_service.get_snapshot(from_package, force_refresh, self._emit_status_message)
+        with self.client_lock:
+            self.client_sources[request.sid] = snapshot.source
 
         # Emit a status message
-        status_message = f'Downloaded {self.material_count} materials.'
+        status_message = f'Downloaded {snapshot.material_count} materials.'
         self._emit_status_message(status_message)
 
-        # Emit the data back to the client
-        emit('materialx_downloaded', {
-            'materialCount': self.material_count,
-            'materialNames': self.material_names,
-            'materialsList': materials_list
-        }, broadcast=True)
+        # Emit the catalogue summary back to the client
+        self._emit_to_client('materialx_downloaded', {
+            'materialCount': snapshot.material_count,
+            'categories': snapshot.categories
+        })
+
+    def handle_query_materials(self, data):
+        '''
+        @brief Handle the 'query_materials' event, and send a page of material results to the requesting client.
+        Results include the preview URL for each material. Data emitted is of the form:
+        { 'total': int, 'offset': int, 'limit': int, 'results': list of material results }
+        @param data The data received from the client, optionally containing:
+        { 'offset': int, 'limit': int, 'title': string, 'tags': list of strings, 'category': string, 
+          'sortKey': string, 'descending': bool, 'fuzzy': bool }
+        Fuzzy title matches are always ordered by similarity.
+        '''
+        snapshot = self._client_snapshot()
+        if snapshot is None:
+            self._emit_to_client('materials_queried', { 'total': 0, 'offset': 0, 'limit': 0, 'results': [] })
+            return
+
+        try:
+            page = snapshot.query(data.get('offset', 0), data.get('limit', 50), data.get('title', ''),
+                                  data.get('tags'), data.get('category', ''), data.get('sortKey', 'title'),
+                                  data.get('descending', False), data.get('fuzzy', False))
+        except (TypeError, ValueError) as e:
+            self._emit_status_message(f'Invalid material query: {e}')
+            return
+        self._emit_to_client('materials_queried', page)
+
+    def _get_package(self, snapshot, position):
+        '''
+        @brief Get the extracted package for a material, downloading it if it is not cached.
+        @param snapshot The catalogue snapshot.
+        @param position The result position of the material in the snapshot.
+        @return Tuple of the package cache entry of the form
+        { 'key': string, 'title': string, 'zip': bytes, 'files': list }, or None if the material has no package,
+        and whether the entry was cached.
+        '''
+        result = snapshot.results[position]
+        title = result.get('title', '')
+        packages = result.get('packages') or []
+        if not packages:
+            return None, False
+
+        # Packages are re-uploaded with a new identifier, and the material updated date changes
+        key = self.package_cache.make_key(title, packages[0], result.get('updated_date', ''))
+        entry = self.package_cache.get(key)
+        if entry is not None:
+            return entry, True
+        with self.download_semaphore:
+            package = snapshot.download_package(position)
+        if not package[0]:
+            return None, False
+        return self.package_cache.put(key, title, package[0]), False
+
+    def _emit_file_chunks(self, extract_id, title, file_name, file_type, mime_type, size, chunks, pending, sid, to):
+        '''
+        @brief Emit the data for an extracted file as a series of binary chunks. Each chunk is of the form:
+        { 'extractId': string, 'title': string, 'fileName': string, 'type': 'mtlx' or 'image',
+          'mimeType': string, 'chunkIndex': int, 'chunkCount': int, 'data': bytes }
+        The requesting client acknowledges each chunk. At most EXTRACT_CHUNK_WINDOW chunks are
+        unacknowledged before the next chunk is read, so only a few chunks are held in memory
+        or queued for a slow client.
+        @param extract_id The identifier of the extraction request.
+        @param title The material title.
+        @param file_name The file name within the package.
+        @param file_type The file type: 'mtlx' or 'image'.
+        @param mime_type The MIME type of the file data.
+        @param size The file size in bytes.
+        @param chunks Iterable of the file data in chunks of EXTRACT_CHUNK_SIZE bytes. It is consumed
+        one chunk at a time as earlier chunks are acknowledged.
+        @param pending Deque of unacknowledged chunks, shared by all files of the extraction.
+        @param sid The requesting client session.
+        @param to The recipient returned by _client_target().
+        @return False if the client stopped acknowledging chunks.
+        '''
+        chunk_count = max(1, (size + self.EXTRACT_CHUNK_SIZE - 1) // self.EXTRACT_CHUNK_SIZE)
+        chunk_iterator = iter(chunks)
+        for chunk_index in range(chunk_count):
+            # Wait for the client to receive earlier chunks before reading the next one
+            if not self._wait_for_delivery(pending, self.EXTRACT_CHUNK_WINDOW - 1, self.DELIVERY_TIMEOUT):
+                return False
+            chunk = next(chunk_iterator, b'')
+            pending.append(self._emit_acknowledged('materialx_file_chunk', {
+                'extractId': extract_id,
+                'title': title,
+                'fileName': file_name,
+                'type': file_type,
+                'mimeType': mime_type,
+                'chunkIndex': chunk_index,
+                'chunkCount': chunk_count,
+                'data': chunk
+            }, sid, to))
+        return True
+
+    def _get_file_chunks(self, package, item):
+        '''
+        @brief Return the chunks of a prepared file. MaterialX documents are held as prepared strings,
+        and images are read from the package zip one chunk at a time.
+        '''
+        chunk_size = self.EXTRACT_CHUNK_SIZE
+        if item['data'] is not None:
+            data = item['data']
+            return (data[offset:offset + chunk_size] for offset in range(0, len(data), chunk_size))
+        return read_package_file_chunks(package, item['fileName'], chunk_size)
+
+    def _prepare_material(self, snapshot, position, update_mtlx):
+        '''
+        @brief Get the package for a material and prepare its files for sending. Runs in the extraction pool.
+        MaterialX documents are read and optionally upgraded. Images are not read: they are sent
+        from the package a chunk at a time.
+        @param snapshot The catalogue snapshot.
+        @param position The result position of the material in the snapshot.
+        @param update_mtlx If True, upgrade MaterialX documents to the current MaterialX version.
+        @return Dictionary of the form:
+        { 'title': string, 'url': string, 'messages': list of status strings, 'package': package cache entry,
+          'files': [ { 'fileName': string, 'type': string, 'mimeType': string, 'size': int, 'data': bytes or None } ] }
+        '''
+        title = snapshot.results[position].get('title', '')
+        material = { 'title': title, 'url': snapshot.get_preview_url(title), 'messages': [], 'package': None, 'files': [] }
+        messages = material['messages']
+
+        package, cached = self._get_package(snapshot, position)
+        if cached:
+            messages.append(f'Using cached package for material: {title}')
+        if not package:
+            return material
+        material['package'] = package
+
+        for item in package['files']:
+            file_name = item['file_name']
+            if item['type'] == 'mtlx':
+                messages.append(f'- MaterialX file {file_name}')
+                mx_string = read_package_file(package, file_name).decode('utf-8')
+                if update_mtlx:
+                    mx_string, upgrade_cached = self.upgrade_cache.upgrade(mx_string)
+                    cached_note = ' (cached)' if upgrade_cached else ''
+                    messages.append(f'Updating MaterialX data to version: {mx.getVersionString()}{cached_note}')
+                file_data = mx_string.encode('utf-8')
+                file_size = len(file_data)
+            elif item["type"] == 'image':
+                # Original compressed image bytes are sent as is
+                messages.append(f'- Image file {file_name}')
+                file_data = None
+                file_size = item['size']
+            else:
+                continue
+            material['files'].append({'fileName': file_name, 'type': item['type'], 'mimeType': item['mime_type'],
+                                      'size': file_size, 'data': file_data})
+        return material
 
     def handle_extract_material(self, data):
         '''
-        @brief Handle the 'extract_material' event, extract material data, and send it back to the client.
+        @brief Handle the 'extract_material' event, extract material data, and stream it back to the client.
+        Matched materials are extracted in parallel, and each is sent as soon as it is ready.
+        For each material a 'materialx_material_extracting' event is emitted of the form:
+        { 'extractId': string, 'title': string, 'url': preview URL string }
+        followed by 'materialx_file_chunk' events for each of its files. Once all materials have 
+        been sent, a final 'materialx_extracted' manifest event is emitted of the form:
+        { 'extractId': string, 
+          'extractedData': [ { 'title': string, 'url': string, 
+                               'files': [ { 'fileName': string, 'type': string, 'mimeType': string, 'size': int } ] } ] 
+        }
         @param data The data received from the client, expected to contain:
-        { 'expression': string, 'update_materialx': bool }
+        { 'expression': string, 'update_materialx': bool, 'exact_match': bool }
+        where 'exact_match' defaults to True. If False, the expression is a regular expression matched against the
+        start of material titles.
         '''
-        return_list = []
-
-        if self.loader is None:
+        extract_id = str(uuid.uuid4())
+        manifest = []
+        sid = request.sid
+        to = self._client_target()
+
+        # Use the client's catalogue as published now for the whole extraction
+        snapshot = self._client_snapshot()
+        if snapshot is None:
             self._emit_status_message('Loader is not initialized. Download materials first.')
-            emit('materialx_extracted', {'extractedData': return_list}, broadcast=True)    
+            self._emit_to_client('materialx_extracted', {'extractId': extract_id, 'extractedData': manifest})
             return
 
         self._emit_status_message('Extracting materials...')
@@ -175,53 +555,63 @@ class MaterialXGPUOpenApp(MaterialXFlaskApp):
         if not have_mx:
             update_mtlx = False
 
-        # Since we are selecting only one existing material, use exact match search
-        exact_match = True
-        data_items = self.loader.downloadPackageByExpression(expression, exact_match)
-
-        for data_item in data_items:
-            status_message = f'Extracting material: {data_item[1]}'
-            self._emit_status_message(status_message)
-            package = data_item[0]
-            title = data_item[1]
-            extracted_data = self.loader.extractPackageData(package, None)
-            return_data = {}
-
-            if extracted_data:
-                for item in extracted_data:
-                    file_name = item['file_name']
-                    if item['type'] == 'mtlx':
-                        self._emit_status_message(f'- MaterialX file {file_name}')
-                        mx_string = item['data']
-                        if update_mtlx:
-                            self._emit_status_message(f'Updating MaterialX data to version: {mx.getVersionString()}')
-                            doc = mx.createDocument()
-                            readOptions = mx.XmlReadOptions()
-                            readOptions.readComments = True
-                            readOptions.readNewlines = True
-                            readOptions.upgradeVersion = True
-                            mx.readFromXmlString(doc, mx_string, mx.FileSearchPath(), readOptions)
-                            mx_string = mx.writeToXmlString(doc)
-
-                        return_data[file_name] = mx_string
-                    elif item["type"] == 'image':
-                        self._emit_status_message(f'- Image file {file_name}')
-                        image = item["data"]
-                        image_base64 = self.loader.convertPilImageToBase64(image)
-                        return_data[file_name] = image_base64                    
-
-            if len(return_data) > 0:
-                url = self.loader.getMaterialPreviewURL(title)
-                self._emit_status_message(f'Preview URL: {url}')
-                return_list.append({'title': title, 'data': return_data, 'url': url})
-
-        if len(return_list) == 0:
+        # Selecting a single existing material uses exact match search by default
+        exact_match = data.get('exact_match', True)
+        try:
+            positions = snapshot.find_materials(expression, exact_match)
+        except re.error as e:
+            self._emit_status_message(f'Invalid expression: {expression}. Error: {e}')
+            positions = []
+        if not positions:
+            suggestions = [snapshot.results[i]['title'] for i in snapshot.find_fuzzy(expression, 5)]
+            if suggestions:
+                self._emit_status_message(f'No material named: {expression}. Closest matches: {", ".join(suggestions)}')
+        if len(positions) > self.MAX_EXTRACT_MATERIALS:
+            self._emit_status_message(f'Expression matched {len(positions)} materials. Extracting the first {self.MAX_EXTRACT_MATERIALS}.')
+            positions = positions[:self.MAX_EXTRACT_MATERIALS]
+
+        futures = {}
+        for position in positions:
+            title = snapshot.results[position].get('title', '')
+            self._emit_status_message(f'Extracting material: {title}')
+            futures[self.extract_executor.submit(self._prepare_material, snapshot, position, update_mtlx)] = title
+
+        # Send materials in the order they complete
+        pending = deque()
+        for future in as_completed(futures):
+            try:
+                material = future.result()
+            except Exception as e:
+                self._emit_status_message(f'Failed to extract material: {futures[future]}. Error: {e}')
+                continue
+            for message in material['messages']:
+                self._emit_status_message(message)
+            if not material['files']:
+                continue
+
+            title = material['title']
+            url = material['url']
+            self._emit_status_message(f'Preview URL: {url}')
+            self._emit_to_client('materialx_material_extracting', {'extractId': extract_id, 'title': title, 'url': url})
+
+            files = []
+            for item in material['files']:
+                chunks = self._get_file_chunks(material['package'], item)
+                if not self._emit_file_chunks(extract_id, title, item['fileName'], item['type'], item['mimeType'],
+                                              item['size'], chunks, pending, sid, to):
+                    print(f'Python: Client did not receive extracted files. Stopping extraction: {extract_id}')
+                    for remaining in futures:
+                        remaining.cancel()
+                    return
+                files.append({'fileName': item['fileName'], 'type': item['type'], 'mimeType': item['mimeType'], 'size': item['size']})
+            manifest.append({'title': title, 'url': url, 'files': files})
+
+        if len(manifest) == 0:
             self._emit_status_message('No materials extracted')
-            emit('materialx_extracted', {'extractedData': return_list}, broadcast=True)
         else:
-            status_message = f'Extracted {len(return_list)} materials'
+            status_message = f'Extracted {len(manifest)} materials'
             self._emit_status_message(status_message)
-            emit('materialx_extracted', {'extractedData': return_list}, broadcast=True)
+        self._emit_to_client('materialx_extracted', {'extractId': extract_id, 'extractedData': manifest})
 
     def _setup_event_handler_map(self):
         '''
@@ -230,6 +620,7 @@ class MaterialXGPUOpenApp(MaterialXFlaskApp):
         self.event_handlers = {
             'download_materialx': self.handle_download_materialx,
             'extract_material': self.handle_extract_material,
+            'query_materials': self.handle_query_materials,
         }
 
 # Main entry point
@@ -240,15 +631,49 @@ def main():
     -h/--host: Host address to run the server on (default: 127.0.0.1)
     -po/--port: Port to run the server on (default: 8080)
     -ho/--home: Home page template (default: MaterialXGPUOpenApp.html)
+    --catalog-dir: Folder to persist the material catalogue to (default: ~/.materialx_gpuopen)
+    --catalog-ttl: Hours before the material catalogue is refreshed from the server (default: 24)
+    --package-cache-dir: Folder to persist extracted packages to (default: packages folder in the catalogue folder)
+    --package-cache-size: Size in MB of the in-memory package cache (default: 256)
+    --package-cache-disk-size: Size in MB of the on-disk package cache (default: 2048)
+    --extract-workers: Number of materials extracted in parallel (default: 4)
+    --max-downloads: Maximum number of concurrent package downloads (default: 2)
+    --upgrade-cache-dir: Folder to persist upgraded MaterialX documents to (default: upgrades folder in the catalogue folder)
+    --upgrade-cached-packages: Upgrade the MaterialX documents of all cached packages before starting the server
     '''
     parser = argparse.ArgumentParser(description="GPUOpen MaterialX Application")
     parser.add_argument('-hs', '--host', type=str, default='127.0.0.1', help="Host address to run the server on (default: 127.0.0.1)")
     parser.add_argument('-p','--port', type=int, default=8080, help="Port to run the server on (default: 8080)")
     parser.add_argument('-ho', '--home', type=str, default='MaterialXGPUOpenApp.html', help="Home page.")
+    parser.add_argument('--catalog-dir', type=str, default=os.path.join(os.path.expanduser('~'), '.materialx_gpuopen'),
+                        help="Folder to persist the material catalogue to (default: ~/.materialx_gpuopen)")
+    parser.add_argument('--catalog-ttl', type=float, default=24, help="Hours before the material catalogue is refreshed from the server (default: 24)")
+
+    parser.add_argument('--package-cache-dir', type=str, default=None,
+                        help="Folder to persist extracted packages to (default: packages folder in the catalogue folder)")
+    parser.add_argument('--package-cache-size', type=int, default=256, help="Size in MB of the in-memory package cache (default: 256)")
+    parser.add_argument('--package-cache-disk-size', type=int, default=2048, help="Size in MB of the on-disk package cache (default: 2048)")
+
+    parser.add_argument('--extract-workers', type=int, default=4, help="Number of materials extracted in parallel (default: 4)")
+    parser.add_argument('--max-downloads', type=int, default=2, help="Maximum number of concurrent package downloads (default: 2)")
+    parser.add_argument('--upgrade-cache-dir', type=str, default=None,
+                        help="Folder to persist upgraded MaterialX documents to (default: upgrades folder in the catalogue folder)")
+    parser.add_argument('--upgrade-cached-packages', action='store_true',
+                        help="Upgrade the MaterialX documents of all cached packages before starting the server.")
 
     args = parser.parse_args()
 
-    app = MaterialXGPUOpenApp(args.home)
+    package_cache_dir = args.package_cache_dir or os.path.join(args.catalog_dir, 'packages')
+    package_cache = GPUOpenPackageCache(args.package_cache_size * 1024 * 1024, package_cache_dir,
+                                        args.package_cache_disk_size * 1024 * 1024)
+    upgrade_cache = None
+    if have_mx:
+        upgrade_cache = MaterialXUpgradeCache(cache_dir=args.upgrade_cache_dir or os.path.join(args.catalog_dir, 'upgrades'))
+    app = MaterialXGPUOpenApp(args.home, args.catalog_dir, args.catalog_ttl * 60 * 60, package_cache,
+                              args.extract_workers, args.max_downloads, upgrade_cache)
+    if args.upgrade_cached_packages:
+        upgraded_count, cached_count = app.upgrade_cached_packages()
+        print(f'Upgraded {upgraded_count} cached MaterialX documents. {cached_count} were already upgraded.')
     app_host = args.host
     app_port = args.port
     app.run(host=app_host, port=app_port)
@@ -0,0 +1,626 @@
+'''
+@file gpuopencatalog.py
+@brief Persistent local mirror of the GPUOpen material catalogue.
+
+The material and render listings are stored on disk page by page together with
+the ETag and Last-Modified values returned by the server. A refresh is only
+performed once the catalogue is older than a time-to-live, and then uses
+conditional requests so that only pages which have changed are downloaded again.
+
+GPUOpenCatalogService shares one catalogue between all clients. Concurrent
+requests for a catalogue wait on a single in-flight fetch, and each fetch
+publishes a new immutable snapshot so readers never see a partially loaded
+catalogue. A catalogue loaded from disk is served immediately, and once stale
+it keeps being served while it is refreshed in the background.
+'''
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from http import HTTPStatus
+
+import requests
+
+from materialxMaterials import GPUOpenLoader as gpuo
+
+class GPUOpenCatalogCache:
+    '''
+    @brief On-disk cache of the GPUOpen material, render and preview listings.
+    '''
+    CACHE_FILE = 'gpuopen_catalog.json'
+    FORMAT_VERSION = 1
+
+    # Fraction of the time-to-live to wait after a failed refresh before trying again
+    RETRY_FRACTION = 0.1
+
+    def __init__(self, cache_dir=None, ttl=24 * 60 * 60, root_url=None, page_size=100, timeout=30):
+        '''
+        @brief Constructor
+        @param cache_dir Folder to persist the catalogue to. If not set, the catalogue is only kept in memory.
+        @param ttl Time in seconds before the catalogue is considered stale and is refreshed.
+        @param root_url Root URL of the GPUOpen API. Defaults to the URL used by GPUOpenMaterialLoader.
+        @param page_size Number of entries requested per page.
+        @param timeout Timeout in seconds for each request.
+        '''
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.root_url = root_url or gpuo.GPUOpenMaterialLoader().root_url
+        self.page_size = page_size
+        self.timeout = timeout
+
+        # Pages are lists of { 'url', 'etag', 'last_modified', 'data' }
+        self.material_pages = []
+        self.render_pages = []
+        self.updated = 0
+
+        # Time of the last refresh attempt, successful or not
+        self.last_attempt = 0
+
+        # Derived data
+        self.materials = []
+        self.renders = { 'renders': [] }
+        self.preview_urls = {}
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _cache_path(self):
+        return os.path.join(self.cache_dir, self.CACHE_FILE)
+
+    def is_empty(self):
+        '''
+        @brief Return True if no catalogue has been loaded or downloaded.
+        '''
+        return len(self.material_pages) == 0
+
+    def is_stale(self):
+        '''
+        @brief Return True if the catalogue is empty or older than the time-to-live.
+        '''
+        return self.is_empty() or (time.time() - self.updated) > self.ttl
+
+    def is_retry_due(self):
+        '''
+        @brief Return True if the catalogue is stale and a refresh has not been attempted recently.
+        After a failed refresh, the next one is not attempted until RETRY_FRACTION of the time-to-live has passed.
+        '''
+        return self.is_stale() and (time.time() - self.last_attempt) > self.ttl * self.RETRY_FRACTION
+
+    def load(self):
+        '''
+        @brief Load the catalogue from disk.
+        @return True if a catalogue was loaded.
+        '''
+        if not self.cache_dir:
+            return False
+        try:
+            with open(self._cache_path(), 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if cached.get('version') != self.FORMAT_VERSION or cached.get('root_url') != self.root_url:
+            return False
+
+        self.material_pages = cached.get('materials', [])
+        self.render_pages = cached.get('renders', [])
+        self.updated = cached.get('updated', 0)
+        self._update_derived_data()
+        return True
+
+    def _save(self):
+        '''
+        @brief Write the catalogue to disk.
+        '''
+        if not self.cache_dir:
+            return
+        path = self._cache_path()
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        cached = {
+            'version': self.FORMAT_VERSION,
+            'root_url': self.root_url,
+            'updated': self.updated,
+            'materials': self.material_pages,
+            'renders': self.render_pages
+        }
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(cached, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f'Failed to write catalogue cache: {path}. Error: {e}')
+
+    def refresh(self, force=False):
+        '''
+        @brief Refresh the catalogue from the server if it is stale.
+        Pages which the server reports as unchanged are reused from the cache.
+        If the server cannot be reached, the cached catalogue is kept.
+        @param force If True, check with the server even if the catalogue is not stale.
+        @return Dictionary of the form:
+        { 'refreshed': bool, 'changed': bool, 'changedPages': int, 'unchangedPages': int, 'error': string or None }
+        where 'changed' is True if any page was changed, added or removed.
+        '''
+        status = { 'refreshed': False, 'changed': False, 'changedPages': 0, 'unchangedPages': 0, 'error': None }
+        if not force and not self.is_stale():
+            return status
+
+        self.last_attempt = time.time()
+        try:
+            with requests.Session() as session:
+                session.headers.update({ 'accept': 'application/json' })
+                material_pages = self._fetch_pages(session, self.root_url + '/materials', self.material_pages, status)
+                render_pages = self._fetch_pages(session, self.root_url + '/renders', self.render_pages, status)
+        except (requests.RequestException, ValueError) as e:
+            status['error'] = str(e)
+            return status
+
+        status['changed'] = (status['changedPages'] > 0 or len(material_pages) != len(self.material_pages)
+                             or len(render_pages) != len(self.render_pages))
+        if status['changed']:
+            self.material_pages = material_pages
+            self.render_pages = render_pages
+            self._update_derived_data()
+        self.updated = time.time()
+        self._save()
+        status['refreshed'] = True
+        return status
+
+    def _fetch_pages(self, session, url, cached_pages, status):
+        '''
+        @brief Fetch all pages of a listing, following the 'next' links returned by the server.
+        @param session The requests session to use.
+        @param url The listing URL.
+        @param cached_pages Previously fetched pages of the listing.
+        @param status Status dictionary to update with changed and unchanged page counts.
+        @return List of pages.
+        '''
+        cached_by_url = { page['url']: page for page in cached_pages }
+        pages = []
+        next_url = f'{url}/?limit={self.page_size}&offset=0'
+        while next_url:
+            cached = cached_by_url.get(next_url)
+            headers = {}
+            if cached:
+                if cached.get('etag'):
+                    headers['If-None-Match'] = cached['etag']
+                if cached.get('last_modified'):
+                    headers['If-Modified-Since'] = cached['last_modified']
+
+            response = session.get(next_url, headers=headers, timeout=self.timeout)
+            if cached and response.status_code == HTTPStatus.NOT_MODIFIED:
+                page = cached
+                status['unchangedPages'] += 1
+            elif response.status_code == HTTPStatus.OK:
+                page = {
+                    'url': next_url,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'data': response.json()
+                }
+                status['changedPages'] += 1
+            else:
+                raise requests.HTTPError(f'{response.status_code} error fetching: {next_url}')
+
+            pages.append(page)
+            next_url = page['data'].get('next')
+        return pages
+
+    def _update_derived_data(self):
+        '''
+        @brief Rebuild the material lists, render list and preview URL lookup from the pages.
+        '''
+        self.materials = [page['data'] for page in self.material_pages]
+        renders = []
+        for page in self.render_pages:
+            renders.extend(page['data'].get('results', []))
+        self.renders = { 'renders': renders }
+
+        # Preview image is the thumbnail of the first render of each material
+        thumbnails = { render['id']: render.get('thumbnail_url') for render in renders }
+        self.preview_urls = {}
+        for material_list in self.materials:
+            for material in material_list.get('results', []):
+                renders_order = material.get('renders_order') or []
+                if renders_order and renders_order[0] in thumbnails:
+                    self.preview_urls[material['title']] = thumbnails[renders_order[0]]
+
+    def apply_to_loader(self, loader):
+        '''
+        @brief Set the catalogue data on a GPUOpenMaterialLoader so that it can be used
+        without downloading the catalogue again.
+        @param loader The loader to update.
+        '''
+        loader.root_url = self.root_url
+        loader.url = self.root_url + '/materials'
+        loader.package_url = self.root_url + '/packages'
+        loader.render_url = self.root_url + '/renders'
+        loader.materials = self.materials
+        loader.renders = self.renders
+        loader.materialPreviews = [{ 'title': title, 'preview_url': url } for title, url in self.preview_urls.items()]
+        loader.getMaterialNames()
+
+
+class GPUOpenCatalogSnapshot:
+    '''
+    @brief A read-only view of the material catalogue. A new snapshot is created for
+    each catalogue update and is never modified after it has been published.
+    Includes an index over the material results to support paged and filtered queries,
+    and title lookup by exact name, prefix, substring or fuzzy match.
+    '''
+    SORT_KEYS = ['title', 'published_date', 'category', 'author']
+    MAX_PAGE_SIZE = 200
+    FUZZY_MIN_SCORE = 0.5
+
+    def __init__(self, loader, source):
+        '''
+        @brief Constructor
+        @param loader A GPUOpenMaterialLoader containing the catalogue. The loader is owned by the snapshot.
+        @param source The catalogue source: 'server' or 'package'.
+        '''
+        self.loader = loader
+        self.source = source
+        self.material_names = list(loader.getMaterialNames())
+        self.material_count = len(self.material_names)
+
+        # Merged material results with preview URLs, sorted by title.
+        # The (list number, material number) location of each result in the loader is kept for downloading.
+        preview_urls = { item['title']: item['preview_url'] for item in (loader.materialPreviews or []) }
+        entries = []
+        for list_number, material_list in enumerate(loader.materials or []):
+            for material_number, material in enumerate(material_list.get('results', [])):
+                result = dict(sorted(material.items()))
+                result['url'] = preview_urls.get(material.get('title'), '')
+                entries.append((result.get('title', ''), list_number, material_number, result))
+        entries.sort(key=lambda x: x[0])
+        self.results = [entry[3] for entry in entries]
+        self.locations = [(entry[1], entry[2]) for entry in entries]
+        self.preview_urls = preview_urls
+        self._build_index()
+
+    @staticmethod
+    def _trigrams(text):
+        '''
+        @brief Return the set of three character substrings of a string.
+        '''
+        return { text[i:i + 3] for i in range(len(text) - 2) }
+
+    def _build_index(self):
+        '''
+        @brief Build the title indices, lookups from lower case tags and categories to result positions,
+        and the result order for each sort key.
+        '''
+        self.titles = [result.get('title', '').lower() for result in self.results]
+
+        # Lower case titles in sorted order for bisection, with their result positions
+        title_order = sorted(range(len(self.titles)), key=lambda i: self.titles[i])
+        self.sorted_titles = [self.titles[i] for i in title_order]
+        self.sorted_title_positions = title_order
+
+        # Trigram to result positions for substring and fuzzy matching
+        self.title_trigrams = [self._trigrams(title) for title in self.titles]
+        self.trigram_index = {}
+        for position, trigrams in enumerate(self.title_trigrams):
+            for trigram in trigrams:
+                self.trigram_index.setdefault(trigram, set()).add(position)
+
+        self.tag_index = {}
+        self.category_index = {}
+        for position, result in enumerate(self.results):
+            for tag in result.get('tags') or []:
+                self.tag_index.setdefault(str(tag).lower(), set()).add(position)
+            category = result.get('category')
+            if category:
+                self.category_index.setdefault(str(category).lower(), set()).add(position)
+
+        # Results are already sorted by title. Other keys use title to break ties.
+        positions = range(len(self.results))
+        self.sort_orders = { 'title': list(positions) }
+        for key in self.SORT_KEYS[1:]:
+            self.sort_orders[key] = sorted(positions, key=lambda i: str(self.results[i].get(key) or ''))
+
+        self.categories = sorted({ str(result['category']) for result in self.results if result.get('category') })
+
+    def find_title(self, title):
+        '''
+        @brief Find a material by title. Matching is case insensitive.
+        @param title The title to find.
+        @return The result position, or None if not found.
+        '''
+        title = title.lower()
+        index = bisect.bisect_left(self.sorted_titles, title)
+        if index < len(self.sorted_titles) and self.sorted_titles[index] == title:
+            return self.sorted_title_positions[index]
+        return None
+
+    def find_prefix(self, prefix):
+        '''
+        @brief Find materials whose title starts with a prefix. Matching is case insensitive.
+        @param prefix The title prefix.
+        @return List of result positions in title order.
+        '''
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self.sorted_titles, prefix)
+        end = start
+        while end < len(self.sorted_titles) and self.sorted_titles[end].startswith(prefix):
+            end += 1
+        return sorted(self.sorted_title_positions[start:end])
+
+    def find_substring(self, text):
+        '''
+        @brief Find materials whose title contains a string. Matching is case insensitive.
+        @param text The string to find.
+        @return Set of result positions.
+        '''
+        text = text.lower()
+        trigrams = self._trigrams(text)
+        if not trigrams:
+            return { i for i, title in enumerate(self.titles) if text in title }
+
+        # Only titles containing every trigram of the text can contain the text
+        candidates = None
+        for trigram in sorted(trigrams, key=lambda t: len(self.trigram_index.get(t, ()))):
+            positions = self.trigram_index.get(trigram, set())
+            candidates = positions if candidates is None else candidates & positions
+            if not candidates:
+                return set()
+        return { i for i in candidates if text in self.titles[i] }
+
+    def find_fuzzy(self, text, limit=None):
+        '''
+        @brief Find materials with titles similar to a string. Titles are scored by the proportion of the
+        string's trigrams they contain, with ties ordered by the proportion of all trigrams which are shared.
+        @param text The string to match.
+        @param limit Maximum number of results. If not set, all results above FUZZY_MIN_SCORE are returned.
+        @return List of result positions, best match first.
+        '''
+        trigrams = self._trigrams(text.lower())
+        if not trigrams:
+            return sorted(self.find_substring(text))
+
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self.trigram_index.get(trigram, ()))
+        scored = []
+        for position, count in shared.items():
+            score = count / len(trigrams)
+            if score >= self.FUZZY_MIN_SCORE:
+                similarity = count / (len(trigrams) + len(self.title_trigrams[position]) - count)
+                scored.append((-score, -similarity, position))
+        scored.sort()
+        return [position for _, _, position in scored[:limit]]
+
+    def find_materials(self, expression, exact_match=False):
+        '''
+        @brief Find materials by title expression, matching the behaviour of 
+        GPUOpenMaterialLoader.findMaterialsByName().
+        @param expression The title if exact_match is set, otherwise a regular expression
+        matched against the start of the title.
+        @param exact_match If True, the title must match exactly.
+        @return List of result positions.
+        '''
+        if exact_match:
+            position = self.find_title(expression)
+            return [] if position is None else [position]
+
+        # Plain text expressions are prefix matches which can use the sorted index
+        if re.escape(expression) == expression:
+            return self.find_prefix(expression)
+        pattern = re.compile(expression, re.IGNORECASE)
+        return [i for i, result in enumerate(self.results) if pattern.match(result.get('title', ''))]
+
+    def download_package(self, position, package_id=0):
+        '''
+        @brief Download the package for a material.
+        @param position The result position of the material.
+        @param package_id The package index to download.
+        @return List of the form [data, title, preview url]. Data is None if there is no package.
+        '''
+        list_number, material_number = self.locations[position]
+        return self.loader.downloadPackage(list_number, material_number, package_id)
+
+    def query(self, offset=0, limit=50, title='', tags=None, category='', sort_key='title', descending=False, fuzzy=False):
+        '''
+        @brief Return a page of material results matching a set of filters.
+        @param offset Index of the first matching result to return.
+        @param limit Maximum number of results to return. Clamped to MAX_PAGE_SIZE.
+        @param title Case insensitive substring the title must contain.
+        @param tags List of tags which must all be present. A single tag may be given as a string.
+        @param category Category the material must be in.
+        @param sort_key One of SORT_KEYS.
+        @param descending If True, sort in descending order. Not used for fuzzy title matches.
+        @param fuzzy If True, match titles similar to the title string instead of containing it.
+        Results are then always ordered by similarity, most similar first, and sort_key and
+        descending are not used.
+        @return Dictionary of the form:
+        { 'total': number of matching results, 'offset': int, 'limit': int, 'results': list of results }
+        '''
+        offset = max(0, int(offset))
+        limit = min(max(1, int(limit)), self.MAX_PAGE_SIZE)
+        if isinstance(tags, str):
+            tags = [tags]
+        elif tags is not None and not isinstance(tags, (list, tuple)):
+            raise TypeError(f'tags must be a list of strings, not {type(tags).__name__}')
+
+        # Intersect the tag and category filters
+        candidates = None
+        filters = [self.tag_index.get(str(tag).lower(), set()) for tag in tags or []]
+        if category:
+            filters.append(self.category_index.get(category.lower(), set()))
+        for positions in filters:
+            candidates = positions if candidates is None else candidates & positions
+
+        if title and fuzzy:
+            order = self.find_fuzzy(title)
+        else:
+            if title:
+                positions = self.find_substring(title)
+                candidates = positions if candidates is None else candidates & positions
+            order = self.sort_orders.get(sort_key, self.sort_orders['title'])
+            if descending:
+                order = reversed(order)
+
+        matches = [i for i in order if candidates is None or i in candidates]
+        return {
+            'total': len(matches),
+            'offset': offset,
+            'limit': limit,
+            'results': [self.results[i] for i in matches[offset:offset + limit]]
+        }
+
+    def get_preview_url(self, title):
+        '''
+        @brief Get the preview image URL for a material.
+        @param title The material title.
+        @return The URL, or an empty string if the material has no preview.
+        '''
+        return self.preview_urls.get(title, '')
+
+class GPUOpenCatalogService:
+    '''
+    @brief Shared catalogue service. Owns the catalogue cache and publishes catalogue snapshots.
+    '''
+    def __init__(self, catalog_cache):
+        '''
+        @brief Constructor
+        @param catalog_cache The GPUOpenCatalogCache used for server catalogues.
+        '''
+        self.catalog_cache = catalog_cache
+        self.lock = threading.Lock()
+
+        # Latest published snapshot per source. Each client session selects a source.
+        self.snapshots = {}
+
+        # In-flight fetch per source
+        self.inflight = {}
+
+    def publish_cached(self):
+        '''
+        @brief Publish a snapshot of the catalogue loaded from disk, so that it can be served
+        without waiting on the server. If it is stale it is refreshed in the background on first use.
+        @return The published GPUOpenCatalogSnapshot, or None if no catalogue was loaded.
+        '''
+        if self.catalog_cache.is_empty():
+            return None
+        loader = gpuo.GPUOpenMaterialLoader()
+        self.catalog_cache.apply_to_loader(loader)
+        snapshot = GPUOpenCatalogSnapshot(loader, 'server')
+        with self.lock:
+            self.snapshots['server'] = snapshot
+        return snapshot
+
+    def get_snapshot(self, from_package=False, force_refresh=False, status_callback=None):
+        '''
+        @brief Get a catalogue snapshot, fetching the catalogue if required.
+        If a fetch for the same source is already in progress, wait for it instead of starting another.
+        A stale server catalogue is returned immediately and refreshed in the background.
+        @param from_package If True, use the catalogue bundled with the materialxMaterials package.
+        @param force_refresh If True, check the server for catalogue changes even if the catalogue is not stale.
+        @param status_callback Optional function called with status message strings.
+        @return A GPUOpenCatalogSnapshot.
+        '''
+        source = 'package' if from_package else 'server'
+        with self.lock:
+            snapshot = self.snapshots.get(source)
+            if snapshot and not force_refresh:
+                if not from_package:
+                    self._refresh_in_background()
+                return snapshot
+
+            future = self.inflight.get(source)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self.inflight[source] = future
+
+        if not is_leader:
+            if status_callback:
+                status_callback('Waiting for material catalogue download in progress...')
+            return future.result()
+
+        return self._fetch_and_publish(source, force_refresh, status_callback, future)
+
+    def _refresh_in_background(self):
+        '''
+        @brief Start a refresh of the server catalogue on a background thread if it is stale,
+        a refresh has not failed recently and a fetch is not already in progress.
+        Must be called with the lock held.
+        '''
+        if not self.catalog_cache.is_retry_due() or 'server' in self.inflight:
+            return
+        future = Future()
+        self.inflight['server'] = future
+
+        def refresh():
+            try:
+                self._fetch_and_publish('server', False, print, future)
+            except Exception as e:
+                print(f'Failed to refresh material catalogue: {e}')
+
+        threading.Thread(target=refresh, name='gpuopen_catalog_refresh', daemon=True).start()
+
+    def _fetch_and_publish(self, source, force_refresh, status_callback, future):
+        '''
+        @brief Fetch a new snapshot for a source, publish it and complete the in-flight future.
+        '''
+        try:
+            snapshot = self._fetch_snapshot(source, force_refresh, status_callback)
+        except Exception as e:
+            with self.lock:
+                del self.inflight[source]
+            future.set_exception(e)
+            raise
+
+        # Publish the new snapshot
+        with self.lock:
+            self.snapshots[source] = snapshot
+            del self.inflight[source]
+        future.set_result(snapshot)
+        return snapshot
+
+    def _fetch_snapshot(self, source, force_refresh, status_callback):
+        '''
+        @brief Build a new snapshot for a source. Called by at most one thread per source at a time.
+        '''
+        loader = gpuo.GPUOpenMaterialLoader()
+        if source == 'package':
+            loader.readPackageFiles()
+            return GPUOpenCatalogSnapshot(loader, source)
+
+        # Only pages which have changed since the last download are fetched
+        if force_refresh or self.catalog_cache.is_stale():
+            if status_callback:
+                status_callback('Checking for material catalogue updates...')
+            refresh_status = self.catalog_cache.refresh(force_refresh)
+            if status_callback:
+                if refresh_status['error']:
+                    status_callback(f'Failed to update material catalogue: {refresh_status["error"]}')
+                else:
+                    status_callback(f'Updated material catalogue. Changed pages: {refresh_status["changedPages"]}. '
+                                    f'Unchanged pages: {refresh_status["unchangedPages"]}')
+
+            # Keep the published snapshot if the catalogue is unchanged
+            with self.lock:
+                published = self.snapshots.get(source)
+            if published and (refresh_status['error'] or not refresh_status['changed']):
+                return published
+        self.catalog_cache.apply_to_loader(loader)
+        return GPUOpenCatalogSnapshot(loader, source)
+
+    def current(self, source=None):
+        '''
+        @brief Get the latest published snapshot for a source without waiting on a fetch.
+        A stale server catalogue is refreshed in the background.
+        @param source 'server' or 'package'. If not set, the server catalogue is used if it
+        has been published, otherwise the package catalogue.
+        @return A GPUOpenCatalogSnapshot, or None if no catalogue has been loaded for the source.
+        '''
+        with self.lock:
+            if source is None:
+                source = 'server' if 'server' in self.snapshots else 'package'
+            snapshot = self.snapshots.get(source)
+            if snapshot is not None and source == 'server':
+                self._refresh_in_background()
+            return snapshot
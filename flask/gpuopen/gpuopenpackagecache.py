@@ -0,0 +1,233 @@
+'''
+@file gpuopenpackagecache.py
+@brief Cache of downloaded and extracted GPUOpen material packages.
+
+Packages are keyed by material title and package version. Each entry holds the
+raw package zip and a table of the MaterialX documents and images it contains.
+File data is not extracted up front: it is read from the package zip when
+needed, and can be read a chunk at a time so that sending a file to a client
+does not hold a decompressed copy of it.
+Entries are kept in the in-memory and on-disk tiers of a TieredCache so that
+packages survive server restarts.
+
+Images are passed through as the compressed bytes stored in the package, and
+are only decoded to create thumbnails when requested.
+'''
+import hashlib
+import io
+import json
+import mimetypes
+import zipfile
+from collections import OrderedDict
+
+from tieredcache import TieredCache
+
+have_pil = False
+try:
+    from PIL import Image as PILImage
+    have_pil = True
+except ImportError:
+    pass
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.exr', '.hdr', '.tif', '.tiff', '.bmp', '.gif')
+
+# Leading bytes of image file formats, and their MIME types
+IMAGE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'v/1\x01', 'image/x-exr'),
+    (b'#?RADIANCE', 'image/vnd.radiance'),
+    (b'#?RGBE', 'image/vnd.radiance'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'BM', 'image/bmp'),
+    (b'GIF8', 'image/gif'),
+]
+
+# Number of leading bytes read to detect an image file format
+IMAGE_SIGNATURE_SIZE = 16
+
+def detect_mime_type(data, file_name):
+    '''
+    @brief Detect the MIME type of image data from its leading bytes, falling back to the file extension.
+    @param data The image bytes.
+    @param file_name The file name.
+    @return MIME type string.
+    '''
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    return mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+
+def list_package_files(data):
+    '''
+    @brief List the MaterialX documents and images in a package zip without extracting them.
+    Only the leading bytes of images are read, to detect their MIME type.
+    @param data The package zip data.
+    @return List of the form:
+    [ { 'file_name': file_name, 'type': 'mtlx' or 'image', 'mime_type': string, 'size': int } ]
+    '''
+    files = []
+    with zipfile.ZipFile(io.BytesIO(data), 'r') as zip_file:
+        for info in zip_file.infolist():
+            file_name = info.filename
+            if file_name.endswith('.mtlx'):
+                files.append({ 'file_name': file_name, 'type': 'mtlx', 'mime_type': 'application/xml',
+                               'size': info.file_size })
+            elif file_name.lower().endswith(IMAGE_EXTENSIONS):
+                with zip_file.open(info) as f:
+                    header = f.read(IMAGE_SIGNATURE_SIZE)
+                files.append({ 'file_name': file_name, 'type': 'image', 'mime_type': detect_mime_type(header, file_name),
+                               'size': info.file_size })
+    return files
+
+def read_package_file(entry, file_name):
+    '''
+    @brief Read a file from a cached package.
+    @param entry The package cache entry.
+    @param file_name The file name within the package.
+    @return The file bytes.
+    '''
+    with zipfile.ZipFile(io.BytesIO(entry['zip']), 'r') as zip_file:
+        return zip_file.read(file_name)
+
+def read_package_file_chunks(entry, file_name, chunk_size):
+    '''
+    @brief Read a file from a cached package a chunk at a time. The file is decompressed
+    as it is read, so only one chunk is held at a time.
+    @param entry The package cache entry.
+    @param file_name The file name within the package.
+    @param chunk_size Size in bytes of each chunk. The last chunk may be smaller.
+    @return Generator of chunk bytes.
+    '''
+    with zipfile.ZipFile(io.BytesIO(entry['zip']), 'r') as zip_file:
+        with zip_file.open(file_name) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+def create_thumbnail(data, size):
+    '''
+    @brief Create a PNG thumbnail of an image.
+    @param data The image bytes.
+    @param size Maximum width and height of the thumbnail.
+    @return PNG bytes, or None if the image cannot be decoded.
+    '''
+    if not have_pil:
+        return None
+    try:
+        with PILImage.open(io.BytesIO(data)) as image:
+            image.thumbnail((size, size))
+            if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+                image = image.convert('RGBA')
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG')
+    except (OSError, ValueError):
+        return None
+    return buffer.getvalue()
+
+def _entry_size(entry):
+    '''
+    @brief Approximate size in bytes of a cache entry.
+    '''
+    return len(entry['zip'])
+
+class GPUOpenPackageCache(TieredCache):
+    '''
+    @brief Two tier (memory and disk) cache of extracted material packages.
+    Entries are dictionaries of the form:
+    { 'key': string, 'title': string, 'zip': bytes, 'files': list of package files from list_package_files() }
+    On disk each entry is stored as the package zip and a table holding the material title.
+    '''
+    extensions = ('.zip', '.json')
+
+    def __init__(self, max_memory_bytes=256 * 1024 * 1024, cache_dir=None, max_disk_bytes=2048 * 1024 * 1024,
+                 max_thumbnails=1024):
+        '''
+        @brief Constructor
+        @param max_memory_bytes Size budget for the in-memory tier.
+        @param cache_dir Folder for the on-disk tier. If not set, only the memory tier is used.
+        @param max_disk_bytes Size budget for the on-disk tier.
+        @param max_thumbnails Maximum number of thumbnails kept in memory.
+        '''
+        self.max_thumbnails = max_thumbnails
+        self.thumbnails = OrderedDict()
+        super().__init__(max_memory_bytes, cache_dir, max_disk_bytes)
+
+    @staticmethod
+    def make_key(title, package_id, version):
+        '''
+        @brief Create a cache key.
+        @param title The material title.
+        @param package_id The identifier of the package.
+        @param version The version of the material. e.g. its updated date.
+        @return Hex digest key.
+        '''
+        header = json.dumps({ 'title': title, 'package': package_id, 'version': version }, sort_keys=True)
+        return hashlib.sha256(header.encode('utf-8')).hexdigest()
+
+    def put(self, key, title, data):
+        '''
+        @brief List the files in a package and store it in all cache tiers.
+        @param key The cache key.
+        @param title The material title.
+        @param data The package zip data.
+        @return The new cache entry.
+        '''
+        entry = { 'key': key, 'title': title, 'zip': data, 'files': list_package_files(data) }
+        super().put(key, entry)
+        return entry
+
+    def _entry_size(self, entry):
+        return _entry_size(entry)
+
+    def _serialize(self, entry):
+        return [entry['zip'], json.dumps({ 'title': entry['title'] }).encode('utf-8')]
+
+    def _deserialize(self, key, contents):
+        data, table_data = contents
+        table = json.loads(table_data.decode('utf-8'))
+        try:
+            files = list_package_files(data)
+        except zipfile.BadZipFile as e:
+            raise ValueError(f'Invalid package zip: {e}')
+        return { 'key': key, 'title': table['title'], 'zip': data, 'files': files }
+
+    def get_thumbnail(self, entry, file_name, size):
+        '''
+        @brief Get a PNG thumbnail of an image in a package, creating it on first request.
+        @param entry The package cache entry.
+        @param file_name The image file name within the package.
+        @param size Maximum width and height of the thumbnail.
+        @return PNG bytes, or None if the file is not an image which can be decoded.
+        '''
+        thumbnail_key = (entry['key'], file_name, size)
+        with self.lock:
+            thumbnail = self.thumbnails.get(thumbnail_key)
+            if thumbnail is not None:
+                self.thumbnails.move_to_end(thumbnail_key)
+                return thumbnail
+
+        item = next((item for item in entry['files'] if item['file_name'] == file_name and item['type'] == 'image'), None)
+        if item is None:
+            return None
+        thumbnail = create_thumbnail(read_package_file(entry, file_name), size)
+        if thumbnail is None:
+            return None
+
+        with self.lock:
+            self.thumbnails[thumbnail_key] = thumbnail
+            while len(self.thumbnails) > self.max_thumbnails:
+                self.thumbnails.popitem(last=False)
+        return thumbnail
+
+    def stats(self):
+        '''
+        @brief Return cache statistics.
+        '''
+        stats = super().stats()
+        with self.lock:
+            stats['thumbnails'] = len(self.thumbnails)
+        return stats
@@ -0,0 +1,80 @@
+'''
+@file mtlxupgradecache.py
+@brief Cache of MaterialX documents upgraded to the current MaterialX version.
+
+Upgraded documents are keyed by a hash of the original document and the target
+MaterialX version. Entries are kept in the in-memory and on-disk tiers of a
+TieredCache so that upgrades survive server restarts.
+'''
+import hashlib
+
+import MaterialX as mx
+
+from tieredcache import TieredCache
+
+class MaterialXUpgradeCache(TieredCache):
+    '''
+    @brief Two tier (memory and disk) cache of upgraded MaterialX document strings.
+    '''
+    extensions = ('.mtlx',)
+
+    def __init__(self, max_memory_bytes=64 * 1024 * 1024, cache_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        '''
+        @brief Constructor
+        @param max_memory_bytes Size budget for the in-memory tier.
+        @param cache_dir Folder for the on-disk tier. If not set, only the memory tier is used.
+        @param max_disk_bytes Size budget for the on-disk tier.
+        '''
+        super().__init__(max_memory_bytes, cache_dir, max_disk_bytes)
+        self.target_version = mx.getVersionString()
+
+        # Read options are the same for every upgrade
+        self.read_options = mx.XmlReadOptions()
+        self.read_options.readComments = True
+        self.read_options.readNewlines = True
+        self.read_options.upgradeVersion = True
+
+    def make_key(self, document):
+        '''
+        @brief Create a cache key from a document and the target MaterialX version.
+        @param document The original document string.
+        @return Hex digest key.
+        '''
+        hasher = hashlib.sha256(self.target_version.encode('utf-8'))
+        hasher.update(b'\0')
+        hasher.update(document.encode('utf-8'))
+        return hasher.hexdigest()
+
+    def upgrade(self, document):
+        '''
+        @brief Upgrade a document to the current MaterialX version, using the cached result if available.
+        @param document The original document string.
+        @return Tuple of the upgraded document string and whether it was cached.
+        '''
+        key = self.make_key(document)
+        upgraded = self.get(key)
+        if upgraded is not None:
+            return upgraded, True
+
+        doc = mx.createDocument()
+        mx.readFromXmlString(doc, document, mx.FileSearchPath(), self.read_options)
+        upgraded = mx.writeToXmlString(doc)
+        self.put(key, upgraded)
+        return upgraded, False
+
+    def _entry_size(self, upgraded):
+        return len(upgraded)
+
+    def _serialize(self, upgraded):
+        return [upgraded.encode('utf-8')]
+
+    def _deserialize(self, key, contents):
+        return contents[0].decode('utf-8')
+
+    def stats(self):
+        '''
+        @brief Return cache statistics.
+        '''
+        stats = super().stats()
+        stats['targetVersion'] = self.target_version
+        return stats
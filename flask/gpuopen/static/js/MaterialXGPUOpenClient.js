@@ -12,6 +12,17 @@ export class MaterialX_GPUOpen_Client extends WebSocketClient
         this.materialNames = [];
         this.materialCount = 0;
 
+        // Catalogue selected with the last download: 'server' or 'package'
+        this.catalogSource = null;
+
+        // Current page of catalogue query results
+        this.pageSize = 48;
+        this.pageOffset = 0;
+        this.pageTotal = 0;
+
+        // Extraction currently being received
+        this.extraction = null;
+
         // Bind class methods to `this`
         this.findMaterialByName = this.findMaterialByName.bind(this);
         this.populateForm = this.populateForm.bind(this);
@@ -24,19 +35,11 @@ export class MaterialX_GPUOpen_Client extends WebSocketClient
 
 
     findMaterialByName(name) {
-        let foundMaterial = null;
-
-        for (const element of this.materialsList) {
-            let resultsArray = JSON.parse(element).results;
-            if (resultsArray) {
-                for (const result of resultsArray) {
-                    if (result.title === name) {
-                        foundMaterial = result;
-                        console.log('>>>>>>>>>> Popultate form:', result.title);
-                        this.populateForm(result);
-                        return foundMaterial;
-                    }
-                }
+        for (const result of this.materialsList) {
+            if (result.title === name) {
+                console.log('>>>>>>>>>> Popultate form:', result.title);
+                this.populateForm(result);
+                return result;
             }
         }
         return null; // Return null if no match is found
@@ -91,75 +94,186 @@ export class MaterialX_GPUOpen_Client extends WebSocketClient
 
         console.log('WEB: materialx downloaded event:', data);
         this.materialCount = data.materialCount;
-        this.materialsList = data.materialsList;
-        this.materialNames = data.materialNames;
-        // Sort materialNames alphabetically
-        this.materialNames.sort((a, b) => a.localeCompare(b));
-
-        if (this.materialCount > 0) {
-            let listString = '';
-            for (const element of this.materialsList) {
-                listString += element + '\n';
-            }
-            this.editor.setValue(listString);
 
-            // Populate the material select dropdown
-            const materialSelect = document.getElementById('materialSelect');
-            materialSelect.innerHTML = ''; // Clear existing options
-            this.materialNames.forEach((name, index) => {
-                const option = document.createElement('option');
-                option.value = index + 1;
-                option.text = name;
-                materialSelect.appendChild(option);
-            });
-
-            // Populate the form with the first material
-            const firstMaterial = JSON.parse(this.materialsList[0]).results[0];
-            if (firstMaterial) {
-                this.populateForm(firstMaterial);
-            }
+        // Populate the category filter
+        const categorySelect = document.getElementById('filter_category');
+        categorySelect.innerHTML = '<option value="">All Categories</option>';
+        for (const category of data.categories || []) {
+            const option = document.createElement('option');
+            option.value = category;
+            option.text = category;
+            categorySelect.appendChild(option);
+        }
+
+        // Fetch the first page of materials
+        this.queryMaterials(0);
+    }
+
+    queryMaterials(offset) {
+        const tags = document.getElementById('filter_tags').value
+            .split(',').map(tag => tag.trim()).filter(tag => tag.length > 0);
+        const query = {
+            offset: Math.max(0, offset),
+            limit: this.pageSize,
+            title: document.getElementById('filter_title').value,
+            tags: tags,
+            category: document.getElementById('filter_category').value,
+            sortKey: document.getElementById('sort_key').value,
+            descending: document.getElementById('sort_descending').checked,
+            fuzzy: document.getElementById('filter_fuzzy').checked
+        };
+        console.log("WEB: Emitting query_materials event", query);
+        this.emit('query_materials', query);
+    }
+
+    handleMaterialsQueried(data)
+    {
+        console.log('WEB: materials queried event:', data);
+        this.materialsList = data.results;
+        this.materialNames = data.results.map(result => result.title);
+        this.pageOffset = data.offset;
+        this.pageTotal = data.total;
+
+        // Update paging controls
+        const pageStatus = document.getElementById('page_status');
+        if (this.pageTotal > 0) {
+            const last = this.pageOffset + this.materialsList.length;
+            pageStatus.innerText = `${this.pageOffset + 1}-${last} of ${this.pageTotal}`;
+        } else {
+            pageStatus.innerText = '0 materials';
+        }
+        document.getElementById('previous_page').disabled = this.pageOffset == 0;
+        document.getElementById('next_page').disabled = this.pageOffset + this.materialsList.length >= this.pageTotal;
+
+        this.editor.setValue(JSON.stringify({ results: this.materialsList }, null, 2));
+
+        // Populate the material select dropdown
+        const materialSelect = document.getElementById('materialSelect');
+        materialSelect.innerHTML = ''; // Clear existing options
+        this.materialNames.forEach((name, index) => {
+            const option = document.createElement('option');
+            option.value = index + 1;
+            option.text = name;
+            materialSelect.appendChild(option);
+        });
+
+        // Render preview images in gallery using preview URL from backend
+        const gallery = document.getElementById('material_gallery');
+        gallery.innerHTML = '';
+        let firstTitle = '';
+        for (const material of this.materialsList) 
+        {
+            if (material.url) {
+                if (!firstTitle)
+                    firstTitle = material.title;
+
+                const col = document.createElement('div');
+                col.className = 'col-sm-4 col-md-3 col-lg-2 mb-4';
+
+                col.innerHTML = `
+                    <div class="card material-card" data-material-id="${material.title}">
+                        <img loading="lazy" src="${material.url}" id="${material.title} Image" class="card-img-top material-img" alt="${material.title}">
+                        <div class="card-body">
+                            <div style="font-size: 10px;" class="card-title">${material.title}</div>
+                        </div>
+                    </div>
+                `;
 
-            // Render preview images in gallery using preview URL from backend
-            const gallery = document.getElementById('material_gallery');
-            gallery.innerHTML = '';
-            let firstTitle = '';
-            for (const element of this.materialsList) {
-                let materials = JSON.parse(element).results;
-                if (materials) {
-                    // Sort by title
-                    materials.sort((a, b) => a.title.localeCompare(b.title));
-                    for (const material of materials) 
-                    {
-                        if (material.url) {
-                            if (!firstTitle)
-                                firstTitle = material.title;
-
-                            const col = document.createElement('div');
-                            col.className = 'col-sm-4 col-md-3 col-lg-2 mb-4';
-
-                            col.innerHTML = `
-                                <div class="card material-card" data-material-id="${material.title}">
-                                    <img src="${material.url}" id="${material.title} Image" class="card-img-top material-img" alt="${material.title}">
-                                    <div class="card-body">
-                                        <div style="font-size: 10px;" class="card-title">${material.title}</div>
-                                    </div>
-                                </div>
-                            `;
-
-                            // Select material when clicking on the card
-                            col.querySelector('.card').addEventListener('click', () => {
-                                this.highlightSelectedMaterialInGallery(material.title);
-                                this.selectMaterialByName(material.title);
-                            });
-                            gallery.appendChild(col);
-                        }
-                    }
-                }
+                // Select material when clicking on the card
+                col.querySelector('.card').addEventListener('click', () => {
+                    this.highlightSelectedMaterialInGallery(material.title);
+                    this.selectMaterialByName(material.title);
+                });
+                gallery.appendChild(col);
             }
+        }
+
+        if (firstTitle) {
+            this.highlightSelectedMaterialInGallery(firstTitle);
+            this.selectMaterialByName(firstTitle);
+        }
+        else if (this.materialsList.length > 0) {
+            this.populateForm(this.materialsList[0]);
+        }
+    }
+
+    addImageCard(key, url) {
+        const imageDOM = document.getElementById('extracted_images');
+        const imageContainer = document.createElement('div');
+        imageContainer.className = 'col-sm-4 col-md-3 col-lg-2 mb-4';
+        imageContainer.innerHTML = `
+            <div class="card material-card" data-material-id="${key}">
+                <img loading="lazy" src="${url}" id="${key} Image" class="card-img-top material-img" alt="${key}">
+                <div class="card-body">
+                    <div style="font-size: 10px;" class="card-title">${key}</div>
+                </div>
+            </div>
+        `;
+        imageDOM.appendChild(imageContainer);
+    }
+
+    handleMaterialExtracting(data)
+    {
+        // Only the first material of an extraction is displayed
+        if (this.extraction && this.extraction.extractId === data.extractId) {
+            return;
+        }
+        console.log('WEB: materialx extracting event:', data.title);
+        this.extraction = { extractId: data.extractId, title: data.title, url: data.url, chunks: {}, files: {} };
 
-            if (firstTitle) {
-                this.highlightSelectedMaterialInGallery(firstTitle);
-                this.selectMaterialByName(firstTitle);
+        document.getElementById('extracted_images').innerHTML = ''; // Clear existing images
+        this.extractedEditor.setValue('');
+        if (data.url) {
+            this.addImageCard("Preview Render", data.url);
+        }
+    }
+
+    handleFileChunk(data)
+    {
+        const extraction = this.extraction;
+        if (!extraction || extraction.extractId !== data.extractId || extraction.title !== data.title) {
+            return;
+        }
+
+        // Collect chunks until the file is complete
+        let chunks = extraction.chunks[data.fileName];
+        if (!chunks) {
+            chunks = { received: 0, data: new Array(data.chunkCount) };
+            extraction.chunks[data.fileName] = chunks;
+        }
+        chunks.data[data.chunkIndex] = data.data;
+        chunks.received++;
+        if (chunks.received < data.chunkCount) {
+            return;
+        }
+        delete extraction.chunks[data.fileName];
+
+        const key = data.fileName;
+        if (data.type === 'mtlx') {
+            const decoder = new TextDecoder();
+            let text = '';
+            for (const chunk of chunks.data) {
+                text += decoder.decode(chunk, { stream: true });
+            }
+            text += decoder.decode();
+            extraction.files[key] = text;
+            this.extractedEditor.setValue(text);
+        } else {
+            const extension = key.split('.').pop();
+            const mimeType = data.mimeType || `image/${extension}`;
+            const blob = new Blob(chunks.data, { type: mimeType });
+            extraction.files[key] = blob;
+
+            // Use a server generated thumbnail if requested, or if the browser cannot display the image format
+            const displayable = ['image/png', 'image/jpeg', 'image/gif', 'image/bmp'].includes(mimeType);
+            const useThumbnail = document.getElementById('use_thumbnails').checked || !displayable;
+            if (useThumbnail) {
+                const params = new URLSearchParams({ title: extraction.title, file: key, size: 256 });
+                if (this.catalogSource)
+                    params.set('source', this.catalogSource);
+                this.addImageCard(key, `thumbnail?${params.toString()}`);
+            } else {
+                this.addImageCard(key, URL.createObjectURL(blob));
             }
         }
     }
@@ -171,110 +285,43 @@ export class MaterialX_GPUOpen_Client extends WebSocketClient
         const extractStatus = document.getElementById('extract_status');
         extractStatus.innerText = 'Extract'; 
 
-        console.log('WEB: materialx extracted event:', data.extractedData);
-        const extractedData = data.extractedData[0];
-        if (!extractedData) {
+        console.log('WEB: materialx extracted manifest:', data.extractedData);
+        const extraction = this.extraction;
+        if (!data.extractedData[0] || !extraction || extraction.extractId !== data.extractId) {
             console.log('No extracted data received');
             return;
         }
-        const title = extractedData.title;
+        const title = extraction.title;
+        const preview_url = extraction.url;
         console.log('Title:', title);
-
-        const preview_url = extractedData.url;
         console.log('URL:', preview_url);
 
-        const dataObj = extractedData.data;
-        const imageDOM = document.getElementById('extracted_images');
-        imageDOM.innerHTML = ''; // Clear existing images
-
-        const mtlxDOM = document.getElementById('extracted_mtlx');
-        this.extractedEditor.setValue('');
-
-        // Extract MTLX and images out. 
         // Optionally save zip of data to file.
         let save_extracted = document.getElementById('save_extracted').checked;
-        let zip = save_extracted ? new JSZip() : null;
-        
+        if (!save_extracted) {
+            return;
+        }
+        let zip = new JSZip();
 
+        // Add "url.txt" file to zip where "url" is the preview URL, for reference
         if (preview_url) {
-            const imageContainer = document.createElement('div');
-            imageContainer.className = 'col-sm-4 col-md-3 col-lg-2 mb-4';
-            let key = "Preview Render";
-            imageContainer.innerHTML = `
-                <div class="card material-card" data-material-id="${key}">
-                    <img loading="lazy" src="${preview_url}" id="${key} Image" class="card-img-top material-img" alt="${key}">
-                    <div class="card-body">
-                        <div style="font-size: 10px;" class="card-title">${key}</div>
-                    </div>
-                </div>
-            `;
-
-            // Add "url.txt" file to zip where "url" is the preview URL, for reference
-            if (zip)
-            {
-                const urlFile = new File([preview_url], "url.txt", { type: 'text/plain' });
-                zip.file("url.txt", urlFile);
-            }
-                    
-            imageDOM.appendChild(imageContainer);
+            zip.file("url.txt", new File([preview_url], "url.txt", { type: 'text/plain' }));
         }
-
-        for (const key in dataObj) {
-            if (key.endsWith('.mtlx')) {
-                this.extractedEditor.setValue(dataObj[key]);
-                // Add the extracted MaterialX file to the zip
-                if (zip)
-                    zip.file(key, dataObj[key]);
-            } else {
-                const base64String = dataObj[key];
-                const binary = atob(base64String);
-                const array = new Uint8Array(binary.length);
-                for (let i = 0; i < binary.length; i++) {
-                    array[i] = binary.charCodeAt(i);
-                }
-                const extension = key.split('.').pop();
-                const blob = new Blob([array], { type: `image/${extension}` });
-                const url = URL.createObjectURL(blob);
-
-                // Create a container for the image and label
-                const imageContainer = document.createElement('div');
-                imageContainer.className = 'col-sm-4 col-md-3 col-lg-2 mb-4';
-                imageContainer.innerHTML = `
-                    <div class="card material-card" data-material-id="${key}">
-                        <img src="${url}" id="${key} Image" class="card-img-top material-img" alt="${key}">
-                        <div class="card-body">
-                            <div style="font-size: 10px;" class="card-title">${key}</div>
-                        </div>
-                    </div>
-                `;
-                
-                // Append the container to the image DOM
-                imageDOM.appendChild(imageContainer);
-
-                // Convert the blob to a file and add it to the zip
-                if (zip)
-                {
-                    const imgFile = new File([blob], key, { type: 'image/${extension}' });
-                    zip.file(key, imgFile);
-                }
-            }
+        for (const key in extraction.files) {
+            zip.file(key, extraction.files[key]);
         }
 
-
         // Create the zip file asynchronously
-        if (zip)
-        {
-            zip.generateAsync({ type: 'blob' }).then(function(content) {
-                // Create a download link for the zip file
-                const link = document.createElement('a');
-                link.href = URL.createObjectURL(content);
-                link.download = title + '.zip'; // Set the name of the zip file
-                link.click(); // Trigger the download
-            })
-            .catch(function(error) {
-                console.error('Error creating zip file:', error);
-            });           
-        }        
+        zip.generateAsync({ type: 'blob' }).then(function(content) {
+            // Create a download link for the zip file
+            const link = document.createElement('a');
+            link.href = URL.createObjectURL(content);
+            link.download = title + '.zip'; // Set the name of the zip file
+            link.click(); // Trigger the download
+        })
+        .catch(function(error) {
+            console.error('Error creating zip file:', error);
+        });
     }
 
     extractMaterials() {
@@ -297,6 +344,7 @@ export class MaterialX_GPUOpen_Client extends WebSocketClient
         downloadSpinner.classList.remove('d-none'); // Show spinner
         downloadStatus.innerText = 'Fetching...';
         let from_package = document.getElementById('download_from_package').checked;
+        this.catalogSource = from_package ? 'package' : 'server';
         this.emit('download_materialx', { 'frompackage': from_package });
     }
 
@@ -316,10 +364,27 @@ export class MaterialX_GPUOpen_Client extends WebSocketClient
             this.downloadMaterials();
         });
 
+        // Re-query from the first page when filters change
+        for (const id of ['filter_title', 'filter_fuzzy', 'filter_tags', 'filter_category', 'sort_key', 'sort_descending']) {
+            document.getElementById(id).addEventListener('change', () => { this.queryMaterials(0); });
+        }
+
+        // Paging
+        document.getElementById('previous_page').addEventListener('click', () => {
+            this.queryMaterials(this.pageOffset - this.pageSize);
+        });
+        document.getElementById('next_page').addEventListener('click', () => {
+            this.queryMaterials(this.pageOffset + this.pageSize);
+        });
+
         // Set up socket message event handlers
         this.webSocketWrapper = new WebSocketEventHandlers(this.socket, {
             materialx_status: (data) => { console.log('WEB: materialx status event:', data.message); this.updateStatusInput(data.message) },
             materialx_downloaded: (data) => { this.handleMaterialXDownLoad(data) },
+            materials_queried: (data) => { this.handleMaterialsQueried(data) },
+            materialx_material_extracting: (data) => { this.handleMaterialExtracting(data) },
+            // Acknowledge each chunk so that the server sends the next ones
+            materialx_file_chunk: (data, ack) => { this.handleFileChunk(data); if (ack) ack(); },
             materialx_extracted: (data) => { this.handleMaterialXExtract(data) }
         });
 
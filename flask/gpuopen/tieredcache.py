@@ -0,0 +1,253 @@
+'''
+@file tieredcache.py
+@brief Two tier (memory and disk) least recently used cache.
+
+Entries are kept in an in-memory LRU tier and optionally in a size-bounded
+on-disk tier so that entries survive server restarts. The cache folder is
+scanned once at startup, after which the size of the disk tier is tracked as
+entries are written and evicted.
+'''
+import os
+import threading
+from collections import OrderedDict
+
+class TieredCache:
+    '''
+    @brief Base class of two tier (memory and disk) caches.
+
+    Each entry is stored on disk as one file per extension in 'extensions'.
+    Subclasses implement _entry_size(), _serialize() and _deserialize().
+    '''
+    # File extensions of the files stored for each entry. The file with the last
+    # extension is written last and marks the entry as complete.
+    extensions = ('.json',)
+
+    def __init__(self, max_memory_bytes, cache_dir=None, max_disk_bytes=0):
+        '''
+        @brief Constructor
+        @param max_memory_bytes Size budget for the in-memory tier.
+        @param cache_dir Folder for the on-disk tier. If not set, only the memory tier is used.
+        @param max_disk_bytes Size budget for the on-disk tier.
+        '''
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        # Sizes of the entries in the disk tier, from least to most recently used
+        self.disk = OrderedDict()
+        self.disk_bytes = 0
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._scan_disk()
+
+    def _entry_size(self, entry):
+        '''
+        @brief Return the approximate size in bytes of an entry in memory.
+        '''
+        raise NotImplementedError('Subclasses must implement _entry_size')
+
+    def _serialize(self, entry):
+        '''
+        @brief Return the contents of the files stored for an entry: a list of bytes, one per extension.
+        '''
+        raise NotImplementedError('Subclasses must implement _serialize')
+
+    def _deserialize(self, key, contents):
+        '''
+        @brief Create an entry from the contents of its files. Raises ValueError or KeyError if
+        the contents are not valid.
+        '''
+        raise NotImplementedError('Subclasses must implement _deserialize')
+
+    def _disk_paths(self, key):
+        return [os.path.join(self.cache_dir, key + extension) for extension in self.extensions]
+
+    def _scan_disk(self):
+        '''
+        @brief Find the entries in the disk tier, ordered by when they were last used.
+        '''
+        marker = self.extensions[-1]
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(marker):
+                key = entry.name[:-len(marker)]
+                try:
+                    mtime = entry.stat().st_mtime
+                    size = sum(os.path.getsize(path) for path in self._disk_paths(key))
+                except OSError:
+                    continue
+                entries.append((mtime, key, size))
+        entries.sort()
+        with self.lock:
+            for _, key, size in entries:
+                self.disk[key] = size
+                self.disk_bytes += size
+            evicted = self._pop_disk_overflow()
+        self._remove_disk(evicted)
+
+    def get(self, key):
+        '''
+        @brief Look up an entry. Returns None if not cached.
+        '''
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry
+            if key not in self.disk:
+                self.misses += 1
+                return None
+            self.disk.move_to_end(key)
+
+        entry = self._read_disk(key)
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._put_memory(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        '''
+        @brief Store an entry in all cache tiers.
+        '''
+        with self.lock:
+            self._put_memory(key, entry)
+        self._write_disk(key, entry)
+
+    def _put_memory(self, key, entry):
+        '''
+        @brief Add an entry to the memory tier, evicting least recently used entries
+        to stay within budget. Must be called with the lock held.
+        '''
+        size = self._entry_size(entry)
+        if size > self.max_memory_bytes:
+            return
+        if key in self.memory:
+            self.memory_bytes -= self._entry_size(self.memory.pop(key))
+        self.memory[key] = entry
+        self.memory_bytes += size
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= self._entry_size(evicted)
+
+    def _read_disk(self, key):
+        '''
+        @brief Read an entry from disk. Entries which cannot be read are removed from the disk tier.
+        '''
+        paths = self._disk_paths(key)
+        try:
+            contents = []
+            for path in paths:
+                with open(path, 'rb') as f:
+                    contents.append(f.read())
+            entry = self._deserialize(key, contents)
+            # Touch the marker file so that the order of use is kept across restarts
+            os.utime(paths[-1])
+        except (OSError, ValueError, KeyError) as e:
+            print(f'Failed to read cache entry: {key}. Error: {e}')
+            with self.lock:
+                self.disk_bytes -= self.disk.pop(key, 0)
+            self._remove_disk([key])
+            return None
+        return entry
+
+    def _write_disk(self, key, entry):
+        if not self.cache_dir:
+            return
+        paths = self._disk_paths(key)
+        contents = self._serialize(entry)
+        suffix = f'.{threading.get_ident()}.tmp'
+        try:
+            for path, data in zip(paths, contents):
+                with open(path + suffix, 'wb') as f:
+                    f.write(data)
+            for path in paths:
+                os.replace(path + suffix, path)
+        except OSError as e:
+            print(f'Failed to write cache file: {paths[-1]}. Error: {e}')
+            return
+
+        size = sum(len(data) for data in contents)
+        with self.lock:
+            self.disk_bytes += size - self.disk.pop(key, 0)
+            self.disk[key] = size
+            evicted = self._pop_disk_overflow()
+        self._remove_disk(evicted)
+
+    def _pop_disk_overflow(self):
+        '''
+        @brief Remove least recently used entries from the disk tier until it is within budget.
+        Must be called with the lock held.
+        @return The keys of the removed entries, whose files are to be deleted.
+        '''
+        evicted = []
+        while self.disk_bytes > self.max_disk_bytes and self.disk:
+            key, size = self.disk.popitem(last=False)
+            self.disk_bytes -= size
+            evicted.append(key)
+        return evicted
+
+    def _remove_disk(self, keys):
+        '''
+        @brief Delete the files of entries. The marker file is deleted first.
+        '''
+        for key in keys:
+            for path in reversed(self._disk_paths(key)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def disk_entries(self):
+        '''
+        @brief Iterate over all entries in the disk tier without adding them to the memory tier.
+        @return Generator of entries.
+        '''
+        with self.lock:
+            keys = list(self.disk)
+        for key in keys:
+            entry = self._read_disk(key)
+            if entry is not None:
+                yield entry
+
+    def stats(self):
+        '''
+        @brief Return cache statistics.
+        '''
+        with self.lock:
+            return {
+                'memoryHits': self.memory_hits,
+                'diskHits': self.disk_hits,
+                'misses': self.misses,
+                'memoryEntries': len(self.memory),
+                'memoryBytes': self.memory_bytes,
+                'diskEntries': len(self.disk),
+                'diskBytes': self.disk_bytes,
+                'diskEnabled': bool(self.cache_dir)
+            }
+
+    def clear(self):
+        '''
+        @brief Remove all entries from all tiers. Statistics are reset.
+        '''
+        with self.lock:
+            self.memory.clear()
+            self.memory_bytes = 0
+            self.memory_hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+            keys = list(self.disk)
+            self.disk.clear()
+            self.disk_bytes = 0
+        self._remove_disk(keys)
@@ -0,0 +1,128 @@
+'''
+@file benchmark_ocio.py
+@brief Benchmark for merging generated OCIO transforms over the ACES Studio config.
+
+Generates the transforms for all color spaces in the ACES Studio config once, as
+the document strings returned by worker processes and stored in the catalogue.
+It then compares two ways of merging them. The first reads each string into a
+temporary document and copies it into the merged document with copyContentFrom.
+The second is TransformDocumentBuilder, which reads each string directly into the
+merged document. Both take time linear in the number of transforms, since
+copyContentFrom only appends. The builder saves one document copy per transform.
+
+With --workers, the transforms are also generated by a pool of worker processes
+as the server does, and the merged result is checked to be the same as when
+generating in a single process.
+'''
+import argparse
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import MaterialX as mx
+from materialxocio import core as mxocio
+
+from materialx_ocio_app import get_source_color_spaces, generate_transform, TransformDocumentBuilder
+from materialx_ocio_app import _init_transform_worker, _generate_transform_job
+
+def readDocument(docString):
+    '''
+    Read a document string into a new document.
+    '''
+    doc = mx.createDocument()
+    mx.readFromXmlString(doc, docString)
+    return doc
+
+def mergeWithCopy(transforms):
+    '''
+    Merge transforms by reading each document string into a temporary document,
+    and copying it into the accumulated documents.
+    '''
+    nodedef_doc = mx.createDocument()
+    impl_doc = mx.createDocument()
+    source_string = ''
+    for definitionString, implString, code in transforms:
+        nodedef_doc.copyContentFrom(readDocument(definitionString))
+        if implString:
+            impl_doc.copyContentFrom(readDocument(implString))
+        source_string += code
+    impl_string = mx.writeToXmlString(impl_doc) if impl_doc.getChildren() else None
+    return mx.writeToXmlString(nodedef_doc), impl_string, source_string
+
+def mergeWithBuilder(transforms):
+    '''
+    Merge transforms using the builder, which reads each document string into the merged documents.
+    '''
+    builder = TransformDocumentBuilder()
+    for transform in transforms:
+        builder.add(*transform)
+    result = builder.build()
+    return result['nodedef_string'], result['impl_string'], result['source_string']
+
+def timeMerge(mergeFunction, transforms, repeat):
+    '''
+    Return the average time to merge the transforms.
+    '''
+    start = time.perf_counter()
+    for _ in range(repeat):
+        mergeFunction(transforms)
+    return (time.perf_counter() - start) / repeat
+
+def checkWorkers(sources, target, nodegraphs, workers, expected):
+    '''
+    Generate the transforms with a pool of worker processes and check that the
+    merged result is the same as the expected result from mergeWithBuilder().
+    '''
+    start = time.perf_counter()
+    builder = TransformDocumentBuilder()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_transform_worker,
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        chunksize = max(1, len(sources) // (workers * 4))
+        for transform in executor.map(_generate_transform_job, sources, repeat(target), repeat(nodegraphs), chunksize=chunksize):
+            builder.add(*transform)
+    result = builder.build()
+    print(f'Generate with {workers} workers: {time.perf_counter() - start:.3f} seconds')
+    same = True
+    for key, value, expectedValue in zip(['nodedef_string', 'impl_string', 'source_string'],
+                                         (result['nodedef_string'], result['impl_string'], result['source_string']), expected):
+        print(f'  {key} same as single process: {value == expectedValue}')
+        same = same and value == expectedValue
+    return same
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark merging generated OCIO transforms over the ACES Studio config")
+    parser.add_argument('--target', type=str, default='lin_rec709', help="Target color space (default: lin_rec709)")
+    parser.add_argument('--nodegraphs', action='store_true', help="Generate node graphs instead of source code.")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of timing repetitions (default: 3)")
+    parser.add_argument('--workers', type=int, default=0, help="Also generate with this number of worker processes and compare the results.")
+    args = parser.parse_args()
+
+    generator = mxocio.OCIOMaterialaxGenerator()
+    _, aconfig = generator.getBuiltinConfigs()
+
+    start = time.perf_counter()
+    transforms = []
+    sources = get_source_color_spaces(aconfig, args.target)
+    for sourceColorSpace in sources:
+        definitionDoc, implDoc, code = generate_transform(generator, aconfig, sourceColorSpace, args.target, args.nodegraphs)
+        if definitionDoc:
+            transforms.append((mx.writeToXmlString(definitionDoc), mx.writeToXmlString(implDoc) if implDoc else None, code))
+    print(f'Generate {len(transforms)} transforms: {time.perf_counter() - start:.3f} seconds')
+
+    copyTime = timeMerge(mergeWithCopy, transforms, args.repeat)
+    builderTime = timeMerge(mergeWithBuilder, transforms, args.repeat)
+    print(f'Merge reading into temporary documents and copying: {copyTime:.4f} seconds')
+    print(f'Merge reading into the merged document (builder)  : {builderTime:.4f} seconds')
+    if builderTime > 0:
+        print(f'Speedup: {copyTime / builderTime:.2f}x')
+    print(f'Merged results are the same: {mergeWithCopy(transforms) == mergeWithBuilder(transforms)}')
+
+    if args.workers > 1:
+        expected = mergeWithBuilder(transforms)
+        if not checkWorkers(sources, args.target, args.nodegraphs, args.workers, expected):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
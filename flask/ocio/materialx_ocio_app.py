@@ -3,13 +3,146 @@
 @brief __PYTHON_APP_DESCRIPTION__
 '''
 import argparse
-from flask import Flask, render_template
-from flask_socketio import SocketIO, emit
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from flask import Flask, render_template, request, jsonify
+from flask_socketio import SocketIO, emit, join_room, leave_room
 
 import MaterialX as mx
 import PyOpenColorIO as OCIO
 from materialxocio import core as mxocio
 
+from ocio_transform_catalog import OCIOTransformCatalog, DEFAULT_MEMORY_BYTES
+
+# Output types which transforms can be generated for
+OUTPUT_TYPES = ('color3', 'color4')
+
+def get_source_color_spaces(config, targetColorSpace):
+    """
+    Return the names of the color spaces in a config to generate transforms from, in config order.
+    An alias is used as the name if there is one which does not contain a space.
+    """
+    sources = []
+    for colorSpace in config.getColorSpaces():
+        aliases = colorSpace.getAliases()
+        trySource = ''
+        for alias in aliases:
+            # Get alias if it does not contain a space
+            if ' ' not in alias:
+                trySource = alias
+        if not trySource:
+            trySource = colorSpace.getName()
+        if trySource:
+            # Skip if the source and target are the same
+            if trySource != targetColorSpace:
+                sources.append(trySource)
+        else:
+            print('Could not find suitable color space name to use: ' + colorSpace.getName())
+    return sources
+
+def generate_transform(generator, aconfig, sourceColorSpace, targetColorSpace, createGraphs, outputType=None):
+    """
+    Generate the MaterialX transform from a source to a target color space.
+    @param outputType The output type. Defaults to 'color3' for node graphs and 'color4' for source code.
+    @return Tuple of the definition document, the implementation document and the source code.
+    The definition document holds the node graph when generating graphs, and is None if
+    no transform could be generated.
+    """
+    print('--- Generate transform for source color space:', sourceColorSpace, '---')
+
+    # Generate source code
+    if not createGraphs:
+        definitionDoc = mx.createDocument()
+        implDoc = mx.createDocument()
+        definition, transformName, code, extension, target = generator.generateOCIO(aconfig, definitionDoc, implDoc, sourceColorSpace, targetColorSpace, outputType or 'color4')
+        if definition:
+            return definitionDoc, implDoc, code
+    else:
+        # Generate node graph
+        graphDoc = generator.generateOCIOGraph(aconfig, sourceColorSpace, targetColorSpace, outputType or 'color3')
+        if graphDoc:
+            return graphDoc, None, ''
+    return None, None, ''
+
+class TransformDocumentBuilder:
+    """
+    Accumulates generated transforms and merges them into a definition document and an
+    implementation document in a single pass when built. Source code is collected in a
+    list and joined once.
+    """
+    def __init__(self):
+        self.definition_docs = []
+        self.impl_docs = []
+        self.sources = []
+
+    def add(self, definitionDoc, implDoc=None, code=''):
+        """
+        Add a generated transform.
+        @param definitionDoc Document with definitions or node graphs. May be a document string.
+        @param implDoc Optional document with implementations. May be a document string.
+        @param code Optional source code.
+        """
+        if definitionDoc:
+            self.definition_docs.append(definitionDoc)
+        if implDoc:
+            self.impl_docs.append(implDoc)
+        if code:
+            self.sources.append(code)
+
+    @staticmethod
+    def _merge(docs):
+        """
+        Append the elements of documents to a new document. Elements with the name
+        of an element which has already been added are skipped.
+        Document strings, such as those returned by worker processes, are read directly
+        into the merged document rather than into a temporary document which is then copied.
+        """
+        merged = mx.createDocument()
+        for doc in docs:
+            if isinstance(doc, str):
+                mx.readFromXmlString(merged, doc)
+            else:
+                # Appends copies of the children which are not already in the merged document
+                merged.copyContentFrom(doc)
+        return merged
+
+    def build(self):
+        """
+        Merge the added transforms.
+        @return Dictionary of the definition, implementation and source code strings.
+        The implementation string is None if there are no implementations.
+        """
+        nodedef_string = mx.writeToXmlString(self._merge(self.definition_docs))
+        impl_doc = self._merge(self.impl_docs)
+        impl_string = mx.writeToXmlString(impl_doc) if impl_doc.getChildren() else None
+        return { 'nodedef_string': nodedef_string, 'impl_string': impl_string, 'source_string': ''.join(self.sources) }
+
+# Generator and ACES config used by each transform generation worker process
+_worker_generator = None
+_worker_config = None
+
+def _init_transform_worker():
+    """
+    Create the generator and ACES config for a transform generation worker process.
+    """
+    global _worker_generator, _worker_config
+    _worker_generator = mxocio.OCIOMaterialaxGenerator()
+    _, _worker_config = _worker_generator.getBuiltinConfigs()
+
+def _generate_transform_job(sourceColorSpace, targetColorSpace, createGraphs):
+    """
+    Generate a transform in a worker process. Documents are returned as strings
+    so that they can be sent back to the server process.
+    """
+    definitionDoc, implDoc, code = generate_transform(_worker_generator, _worker_config, sourceColorSpace, targetColorSpace, createGraphs)
+    return (mx.writeToXmlString(definitionDoc) if definitionDoc else None,
+            mx.writeToXmlString(implDoc) if implDoc else None, code)
+
 class MaterialXFlaskApp:
     def __init__(self, home):
         self.home = home
@@ -18,6 +151,15 @@ class MaterialXFlaskApp:
         self.app = Flask(__name__)
         self.socketio = SocketIO(self.app)
 
+        # Shared room joined by each client session. Responses are sent to all
+        # clients in the room if the requesting client joined one, and otherwise
+        # only to the requesting client.
+        self.client_rooms = {}
+
+        # Connected client sessions. Guarded together with client_rooms by client_lock.
+        self.connected_clients = set()
+        self.client_lock = threading.Lock()
+
         # Register routes and events
         self._register_routes()
         self._setup_event_handler_map()
@@ -47,6 +189,109 @@ class MaterialXFlaskApp:
         # Dynamically register event handlers
         for event_name, handler in self.event_handlers.items():
             self.socketio.on_event(event_name, handler)        
+        self.socketio.on_event('connect', self.handle_connect)
+        self.socketio.on_event('join_room', self.handle_join_room)
+        self.socketio.on_event('leave_room', self.handle_leave_room)
+        self.socketio.on_event('disconnect', self.handle_disconnect)
+
+    def handle_connect(self, auth=None):
+        """
+        Record a connected client session.
+        """
+        with self.client_lock:
+            self.connected_clients.add(request.sid)
+
+    def handle_join_room(self, data):
+        """
+        Handle request to join a shared room. Responses to requests from any client
+        in the room are sent to all clients in the room. Rooms named after a connected
+        client session are rejected, as joining one would receive that client's responses.
+        """
+        room = data.get('room', '')
+        if not room:
+            return
+        with self.client_lock:
+            if room in self.connected_clients:
+                rejected = True
+            else:
+                rejected = False
+                previous_room = self.client_rooms.get(request.sid)
+                self.client_rooms[request.sid] = room
+        if rejected:
+            emit('room_rejected', { 'room': room })
+            return
+        if previous_room:
+            leave_room(previous_room)
+        join_room(room)
+        emit('room_joined', { 'room': room })
+
+    def handle_leave_room(self, data):
+        """
+        Handle request to leave the shared room. Responses are then only sent to the client.
+        """
+        with self.client_lock:
+            room = self.client_rooms.pop(request.sid, None)
+        if room:
+            leave_room(room)
+        emit('room_left', { 'room': room })
+
+    def handle_disconnect(self, reason=None):
+        """
+        Remove a disconnected client session and its room.
+        """
+        with self.client_lock:
+            self.connected_clients.discard(request.sid)
+            self.client_rooms.pop(request.sid, None)
+
+    def _client_target(self):
+        """
+        Return the recipient of responses to the current request: the shared room
+        of the requesting client if it joined one, otherwise the client session.
+        Must be called from within a SocketIO event handler.
+        """
+        with self.client_lock:
+            return self.client_rooms.get(request.sid, request.sid)
+
+    def _emit_to_client(self, event, data, to=None):
+        """
+        Emit a response to the requesting client, or to all clients in its shared room.
+        @param event The event name.
+        @param data The event data.
+        @param to The recipient returned by _client_target(). Required when called
+        outside of a SocketIO event handler.
+        """
+        self.socketio.emit(event, data, to=to or self._client_target())
+
+    def _emit_acknowledged(self, event, data, sid, to):
+        """
+        Emit a response which the requesting client session acknowledges on receipt. Other clients in
+        its shared room are sent the response without an acknowledgement, as acknowledgements
+        are only supported for responses to a single client.
+        @param event The event name.
+        @param data The event data.
+        @param sid The requesting client session.
+        @param to The recipient returned by _client_target().
+        @return threading.Event which is set when the client session acknowledges the response.
+        """
+        delivered = threading.Event()
+        self.socketio.emit(event, data, to=sid, callback=lambda *args: delivered.set())
+        if to != sid:
+            self.socketio.emit(event, data, to=to, skip_sid=sid)
+        return delivered
+
+    @staticmethod
+    def _wait_for_delivery(pending, window, timeout):
+        """
+        Wait until at most 'window' responses are not yet acknowledged.
+        @param pending Deque of the events returned by _emit_acknowledged(), oldest first.
+        @param window The number of responses which may be unacknowledged.
+        @param timeout Time in seconds to wait for each acknowledgement.
+        @return False if a response was not acknowledged in time, e.g. as the client disconnected.
+        """
+        while len(pending) > window:
+            if not pending.popleft().wait(timeout):
+                return False
+        return True
 
     def run(self, host, port, debug=True):
         """
@@ -58,9 +303,19 @@ class MaterialXFlaskApp:
 class materialx_ocio_app(MaterialXFlaskApp):
     '''
     '''
-    def __init__(self, homePage):
+    # Number of streamed transforms sent to the client before waiting for it to acknowledge
+    # receiving them, and the time in seconds to wait for each acknowledgement
+    STREAM_DELIVERY_WINDOW = 2
+    DELIVERY_TIMEOUT = 30
+
+    def __init__(self, homePage, catalog_dir=None, workers=None, catalog_memory_bytes=DEFAULT_MEMORY_BYTES):
         """
         Initialize the Flask application and the MaterialX loader.
+        @param homePage The home page template to render.
+        @param catalog_dir Folder to persist generated transforms to. If not set, they are only kept in memory.
+        @param workers Number of processes used to generate transforms. If 1, transforms are generated
+        in the server process. Defaults to the number of CPUs.
+        @param catalog_memory_bytes Size budget for the generated transforms kept in memory.
         """
         super().__init__(homePage)
 
@@ -78,101 +333,390 @@ class materialx_ocio_app(MaterialXFlaskApp):
         print('> Using MaterialX version:', self.materialx_version)
 
         self.generator = mxocio.OCIOMaterialaxGenerator()
-        #self.configs, self.aconfig = self.generator.getBuiltinConfigs()
+
+        # Builtin configs are read on first use and then reused
+        self.configs = None
+        self.aconfig = None
+        self.config_info = None
+        self.config_lock = threading.Lock()
+
+        # Worker processes for transform generation. Workers are spawned rather than forked,
+        # as the server process runs SocketIO and request threads.
+        self.workers = workers or os.cpu_count() or 1
+        self.transform_executor = None
+        if self.workers > 1:
+            self.transform_executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_transform_worker,
+                                                          mp_context=multiprocessing.get_context('spawn'))
+
+        # Cancellation flags of streaming generation requests. Keyed by stream id.
+        self.streams = {}
+        self.streams_lock = threading.Lock()
+
+        # Catalogue of generated transforms
+        self.catalog = OCIOTransformCatalog(self.OCIO_version, self.materialx_version, catalog_dir, catalog_memory_bytes)
+        print('> Loaded transform catalogue entries:', self.catalog.stats()['entries'])
+
+    def _get_builtin_configs(self):
+        """
+        Return the builtin OCIO configs. These do not change while the server
+        runs so are only read once.
+        """
+        with self.config_lock:
+            if self.configs is None:
+                self.configs, self.aconfig = self.generator.getBuiltinConfigs()
+                self.config_info = self.generator.printConfigs(self.configs)
+        return self.configs, self.aconfig
+
+    def shutdown(self):
+        """
+        Stop the transform generation worker processes.
+        """
+        if self.transform_executor:
+            self.transform_executor.shutdown(wait=True, cancel_futures=True)
+            self.transform_executor = None
+
+    def _register_routes(self):
+        """
+        Register HTTP routes.
+        """
+        super()._register_routes()
+
+        @self.app.route('/transform')
+        def transform():
+            """
+            Return a single transform. Arguments are the same as for the
+            'client_event_get_transform' event.
+            """
+            response = self._get_transform_response(request.args)
+            return jsonify(response), 400 if 'error' in response else 200
 
     def _emit_status_message(self, message):
         """
         Emit a status message to the client.
         """
-        emit('status_message', { 'message': message }, broadcast=True)
+        self._emit_to_client('status_message', { 'message': message })
 
     def handle_get_config_info(self, data):
         '''
         Handle event and send back server information
         '''
         event_data = data.get('message', 'Message')
-        self.configs, self.aconfig = self.generator.getBuiltinConfigs()
-        self.config_info = self.generator.printConfigs(self.configs)
+        self._get_builtin_configs()
  
-        emit('server_message_get_config_info', { 'message': self.config_info }, broadcast=True)
+        self._emit_to_client('server_message_get_config_info', { 'message': self.config_info })
+
+    def generate_config_transforms(self, config, aconfig, targetColorSpace, createGraphs):
+        """
+        Generate MaterialX definitions and implementations, or node graphs, for all
+        color spaces in a config.
+        @return Dictionary of the definition, implementation and source code strings.
+        """
+        builder = TransformDocumentBuilder()
+        sources = get_source_color_spaces(config, targetColorSpace)
+        executor = self.transform_executor
+        if executor:
+            # Results are returned in source order so that the merged document
+            # is the same as when generating in the server process
+            chunksize = max(1, len(sources) // (self.workers * 4))
+            results = executor.map(_generate_transform_job, sources, repeat(targetColorSpace), repeat(createGraphs),
+                                   chunksize=chunksize)
+            for definitionString, implString, code in results:
+                builder.add(definitionString, implString, code)
+        else:
+            for sourceColorSpace in sources:
+                builder.add(*generate_transform(self.generator, aconfig, sourceColorSpace, targetColorSpace, createGraphs))
+        return builder.build()
+
+    def get_config_transforms(self, configName, targetColorSpace, createGraphs):
+        """
+        Return the transforms for all color spaces in a builtin config from the
+        catalogue, generating and adding them if not found.
+        @return Dictionary of the definition, implementation and source code strings.
+        """
+        configs, aconfig = self._get_builtin_configs()
+        settings = {
+            'config': configName,
+            'target': targetColorSpace,
+            'outputType': 'color3' if createGraphs else 'color4',
+            'nodegraphs': bool(createGraphs)
+        }
+        result = self.catalog.get(settings)
+        if result is None:
+            result = self.generate_config_transforms(configs[configName][0], aconfig, targetColorSpace, createGraphs)
+            self.catalog.put(settings, result)
+        return result
 
     def get_materialx_info(self, targetColorSpace, createGraphs):
-        configs, aconfig = self.generator.getBuiltinConfigs()
-        
-        generator = self.generator
-
-        # Generate MaterialX definitions and implementations for all color spaces
-        # found in the ACES Cg Config and ACES Studio Config configurations.
-        nodedef_string = ''
-        nodedef_doc = mx.createDocument()
-        impl_string = ''
-        impl_doc = mx.createDocument()
-        source_string = ''
+        """
+        Return the transforms for all color spaces found in the builtin configs,
+        such as the ACES Cg Config and ACES Studio Config configurations.
+        @return Tuple of the definition, implementation and source code strings.
+        """
+        configs, _ = self._get_builtin_configs()
+
+        builder = TransformDocumentBuilder()
         for c in configs:
-            config = configs[c][0]
-            for colorSpace in config.getColorSpaces():
-                aliases = colorSpace.getAliases()
-                trySource = ''
-                for alias in aliases:
-                    # Get alias if it does not contain a space
-                    if ' ' not in alias:
-                        trySource = alias
-                if not trySource:
-                    trySource = colorSpace.getName()
-                if trySource:
-                    sourceColorSpace = trySource
-
-                    # Skip if the source and target are the same
-                    if sourceColorSpace == targetColorSpace:
-                        continue
-
-                    print('--- Generate transform for source color space:', trySource, '---')
-
-                    # Generate source code
-                    if not createGraphs:
-                        definitionDoc = mx.createDocument()
-                        implDoc = mx.createDocument()
-
-                        definition, transformName, code, extension, target = generator.generateOCIO(aconfig, definitionDoc, implDoc, sourceColorSpace, targetColorSpace, 'color4')
-
-                        # Write the definition, implementation and source code files 
-                        if definition:
-
-                            #filename = outputPath / mx.FilePath(definition.getName() + '.' + 'mtlx')
-                            #print('Write MaterialX definition file:', filename.asString())
-                            #nodedef_string += mx.writeToXmlString(definitionDoc)
-                            nodedef_doc.copyContentFrom(definitionDoc)                                
-
-                            # Write the implementation document
-                            #implFileName = outputPath / mx.FilePath('IM_' + transformName + '.' + 'mtlx')
-                            #print('Write MaterialX implementation file:', implFileName.asString())
-                            nodedef_doc.copyContentFrom(implDoc)
-                            #implementationString = mx.writeToXmlString(implDoc)
-
-                            #impl_string += implementationString
-
-                            source_string += code
-                    else:
-                        # Generate node graph
-                        outputType = 'color3'
-                        graphDoc = generator.generateOCIOGraph(aconfig, sourceColorSpace, targetColorSpace, outputType)
-                        if graphDoc:
-                            nodedef_doc.copyContentFrom(graphDoc)                                
-
-                            transformName = generator.createTransformName(sourceColorSpace, targetColorSpace, outputType, 'mxgraph_')
-                            #filename = outputPath / mx.FilePath(transformName + '.' + 'mtlx')
-                            #print('Write MaterialX node graph definition file:', filename.asString())
-                            #nodedef_string = mx.writeToXmlString(nodedef_doc)
-
-                else:
-                    print('Could not find suitable color space name to use: ' + colorSpace.getName())
-        
-        nodedef_string = mx.writeToXmlString(nodedef_doc)
-        if len(impl_doc.getChildren()) > 0:
-            impl_string = mx.writeToXmlString(impl_doc)
+            result = self.get_config_transforms(c, targetColorSpace, createGraphs)
+            builder.add(result['nodedef_string'], result['impl_string'], result['source_string'])
+        result = builder.build()
+        return result['nodedef_string'], result['impl_string'], result['source_string']
+
+    @staticmethod
+    def _transform_settings(configName, sourceColorSpace, targetColorSpace, createGraphs, outputType):
+        """
+        Return the catalogue settings for a single transform.
+        """
+        return {
+            'config': configName,
+            'source': sourceColorSpace,
+            'target': targetColorSpace,
+            'outputType': outputType,
+            'nodegraphs': bool(createGraphs)
+        }
+
+    def get_transform(self, configName, sourceColorSpace, targetColorSpace, createGraphs, outputType=None):
+        """
+        Return a single transform from the catalogue, generating and adding it if not found.
+        @param configName Name of the builtin config to use. If empty, the ACES config is used.
+        @param sourceColorSpace The source color space.
+        @param targetColorSpace The target color space.
+        @param createGraphs Whether to generate a node graph instead of source code.
+        @param outputType The output type. Defaults to 'color3' for node graphs and 'color4' for source code.
+        @return Tuple of the dictionary of the definition, implementation and source code strings,
+        and whether it was found in the catalogue.
+        """
+        configs, aconfig = self._get_builtin_configs()
+        if configName:
+            if configName not in configs:
+                raise ValueError(f'Unknown config: {configName}')
+            config = configs[configName][0]
         else:
-            impl_string = None
-        return nodedef_string, impl_string, source_string
+            config = aconfig
+        for colorSpaceName in [sourceColorSpace, targetColorSpace]:
+            if not config.getColorSpace(colorSpaceName):
+                raise ValueError(f'Unknown color space: {colorSpaceName}')
+        outputType = outputType or ('color3' if createGraphs else 'color4')
+        if outputType not in OUTPUT_TYPES:
+            raise ValueError(f'Unsupported output type: {outputType}')
+
+        settings = self._transform_settings(configName, sourceColorSpace, targetColorSpace, createGraphs, outputType)
+        result = self.catalog.get(settings)
+        if result is not None:
+            return result, True
+
+        definitionDoc, implDoc, code = generate_transform(self.generator, config, sourceColorSpace, targetColorSpace,
+                                                          createGraphs, outputType)
+        if not definitionDoc:
+            raise ValueError(f'Could not generate transform from {sourceColorSpace} to {targetColorSpace}')
+        builder = TransformDocumentBuilder()
+        builder.add(definitionDoc, implDoc, code)
+        result = builder.build()
+        self.catalog.put(settings, result)
+        return result, False
+
+    def _get_transform_response(self, data):
+        """
+        Return the response for a single transform request.
+        """
+        nodegraphs = data.get('nodegraphs', False)
+        if isinstance(nodegraphs, str):
+            nodegraphs = nodegraphs.lower() in ('1', 'true', 'yes')
+        response = {
+            'config': data.get('config', ''),
+            'source': data.get('source', ''),
+            'target': data.get('target', 'lin_rec709'),
+            'outputType': data.get('outputType', ''),
+            'nodegraphs': nodegraphs
+        }
+        try:
+            result, cached = self.get_transform(response['config'], response['source'], response['target'],
+                                                nodegraphs, response['outputType'])
+        except ValueError as e:
+            response['error'] = str(e)
+            return response
+        response.update(result)
+        response['cached'] = cached
+        return response
+
+    def handle_get_transform(self, data):
+        """
+        Handle request for a single transform. The data is of the form:
+        { 'config': config name, 'source': color space, 'target': color space,
+          'outputType': 'color3' or 'color4', 'nodegraphs': bool }
+        The response contains the request values, and either the definition, implementation
+        and source code strings or an 'error' message.
+        """
+        response = self._get_transform_response(data)
+        if 'error' in response:
+            self._emit_status_message(response['error'])
+        self._emit_to_client('server_message_get_transform', response)
+
+    def stream_transforms(self, targetColorSpace, createGraphs, cancelled, callback):
+        """
+        Generate the transforms for all color spaces found in the builtin configs one at a time.
+        Color spaces are processed in config order, and color spaces found in more than one
+        config are only processed once. Each transform is passed to the callback as soon as it
+        is available. Only a bounded number of transforms are generated ahead of the callback,
+        and generated transforms are added to the catalogue, which writes them to disk and keeps
+        a bounded number in memory.
+        @param targetColorSpace The target color space.
+        @param createGraphs Whether to generate node graphs instead of source code.
+        @param cancelled Event which stops generation when set.
+        @param callback Function called for each transform with the arguments:
+        index, total, source color space, result dictionary or None, whether the result was
+        found in the catalogue, and an error message or None.
+        @return The number of transforms processed.
+        """
+        configs, aconfig = self._get_builtin_configs()
+        outputType = 'color3' if createGraphs else 'color4'
+
+        # Transforms are generated using the ACES config, so color spaces which are in more than one config are only generated once
+        sources = []
+        for c in configs:
+            for sourceColorSpace in get_source_color_spaces(configs[c][0], targetColorSpace):
+                if sourceColorSpace not in sources:
+                    sources.append(sourceColorSpace)
+        total = len(sources)
+
+        # Transforms which are not in the catalogue are submitted to the worker processes, keeping
+        # at most two per worker in flight ahead of the transform being sent.
+        futures = {}
+        executor = self.transform_executor
+        window = 2 * self.workers
+        submitted = 0
+
+        def submit_ahead():
+            nonlocal submitted
+            while executor and submitted < total and len(futures) < window:
+                sourceColorSpace = sources[submitted]
+                submitted += 1
+                settings = self._transform_settings('', sourceColorSpace, targetColorSpace, createGraphs, outputType)
+                if aconfig.getColorSpace(sourceColorSpace) and self.catalog.get(settings) is None:
+                    futures[sourceColorSpace] = executor.submit(_generate_transform_job, sourceColorSpace,
+                                                                targetColorSpace, createGraphs)
+
+        index = 0
+        try:
+            for index, sourceColorSpace in enumerate(sources):
+                if cancelled.is_set():
+                    return index
+                submit_ahead()
+                result, cached, error = None, False, None
+                try:
+                    future = futures.pop(sourceColorSpace, None)
+                    if future:
+                        definitionString, implString, code = future.result()
+                        if definitionString:
+                            builder = TransformDocumentBuilder()
+                            builder.add(definitionString, implString, code)
+                            result = builder.build()
+                            self.catalog.put(self._transform_settings('', sourceColorSpace, targetColorSpace,
+                                                                      createGraphs, outputType), result)
+                        else:
+                            error = f'Could not generate transform from {sourceColorSpace} to {targetColorSpace}'
+                    else:
+                        result, cached = self.get_transform('', sourceColorSpace, targetColorSpace, createGraphs, outputType)
+                except ValueError as e:
+                    error = str(e)
+                callback(index, total, sourceColorSpace, result, cached, error)
+            return total
+        finally:
+            # Drop transforms which have not started when cancelled
+            for future in futures.values():
+                future.cancel()
+
+    def handle_stream_materialx_info(self, data):
+        """
+        Handle request to generate the transforms for all color spaces, sending each one to the
+        client as it is generated. The data is of the form:
+        { 'streamId': optional string, 'target': color space, 'nodegraphs': bool }
+
+        Each transform is sent as a 'server_message_transform_generated' event of the form:
+        { 'streamId', 'index', 'total', 'source', 'target', 'cached', 'nodedef_string',
+          'impl_string', 'source_string' }, with an 'error' message instead of the strings if
+        generation failed. The requesting client acknowledges each transform, and generation waits
+        while more than STREAM_DELIVERY_WINDOW transforms are unacknowledged. A
+        'server_message_stream_done' event with a status of 'done', 'cancelled' or 'error' is sent
+        when finished. A 'server_message_stream_rejected' event is sent instead if the stream
+        identifier is already in use.
+        """
+        stream_id = data.get('streamId') or uuid.uuid4().hex
+        targetColorSpace = data.get('target') or 'lin_rec709'
+        createGraphs = bool(data.get('nodegraphs', False))
+        cancelled = threading.Event()
+        with self.streams_lock:
+            rejected = stream_id in self.streams
+            if not rejected:
+                self.streams[stream_id] = cancelled
+        to = self._client_target()
+        if rejected:
+            self._emit_to_client('server_message_stream_rejected',
+                                 { 'streamId': stream_id, 'reason': 'Stream identifier is already in use' }, to)
+            return
+        self._emit_to_client('server_message_stream_started', { 'streamId': stream_id }, to)
+        self.socketio.start_background_task(self._run_stream, stream_id, targetColorSpace, createGraphs, cancelled,
+                                            request.sid, to)
+
+    def _run_stream(self, stream_id, targetColorSpace, createGraphs, cancelled, sid, to):
+        """
+        Background task which generates and sends the transforms for a stream.
+        Each transform is sent once the client has received all but STREAM_DELIVERY_WINDOW of the
+        earlier ones, so generation does not run ahead of a slow client. The stream is cancelled
+        if the client stops acknowledging transforms.
+        """
+        pending = deque()
+
+        def send_transform(index, total, sourceColorSpace, result, cached, error):
+            message = {
+                'streamId': stream_id,
+                'index': index,
+                'total': total,
+                'source': sourceColorSpace,
+                'target': targetColorSpace,
+                'cached': cached
+            }
+            if error:
+                message['error'] = error
+            else:
+                message.update(result)
+            pending.append(self._emit_acknowledged('server_message_transform_generated', message, sid, to))
+            if not self._wait_for_delivery(pending, self.STREAM_DELIVERY_WINDOW, self.DELIVERY_TIMEOUT):
+                print('> Client did not receive streamed transforms. Cancelling stream:', stream_id)
+                cancelled.set()
+
+        count = 0
+        status = 'done'
+        try:
+            count = self.stream_transforms(targetColorSpace, createGraphs, cancelled, send_transform)
+            if cancelled.is_set():
+                status = 'cancelled'
+        except Exception as e:
+            print('> Error generating transforms:', e)
+            status = 'error'
+        finally:
+            with self.streams_lock:
+                self.streams.pop(stream_id, None)
+        self._emit_to_client('server_message_stream_done', { 'streamId': stream_id, 'status': status, 'count': count }, to)
+
+    def handle_cancel_stream(self, data):
+        """
+        Handle request to stop a streaming generation request.
+        """
+        stream_id = data.get('streamId', '')
+        with self.streams_lock:
+            cancelled = self.streams.get(stream_id)
+        if cancelled:
+            cancelled.set()
+
+    def precompute(self, targetColorSpace):
+        """
+        Generate the transforms for all builtin configs to a target color space,
+        as source code and as node graphs, if they are not already in the catalogue.
+        """
+        configs, _ = self._get_builtin_configs()
+        for c in configs:
+            for createGraphs in [False, True]:
+                self.get_config_transforms(c, targetColorSpace, createGraphs)
 
     def handle_get_materialx_info(self, data):
         '''
@@ -187,20 +731,19 @@ class materialx_ocio_app(MaterialXFlaskApp):
         print('> Generatated MaterialX', nodedef_string != None)
         
         #server_message_get_mtlx_info = 'Using OCIO Version: ' + self.OCIO_version + '. MaterialX Version: ' + self.materialx_version
-        emit('server_message_get_mtlx_info', 
+        self._emit_to_client('server_message_get_mtlx_info', 
              {  'nodedef_string': nodedef_string,
                 'impl_string': impl_string,
                 'source_string': source_string
-              }, broadcast=True)
+              })
 
     def handle_get_version_info(self, data):
         print('> Get version information')
-        emit('server_message_version_info', 
+        self._emit_to_client('server_message_version_info', 
             {   
                 'ocio_version': self.OCIO_version,
                 'materialx_version':  self.materialx_version 
-            },
-            broadcast=True)
+            })
 
     def _setup_event_handler_map(self):
         """
@@ -210,6 +753,9 @@ class materialx_ocio_app(MaterialXFlaskApp):
             'client_event_get_version_info': self.handle_get_version_info,
             'client_event_get_config_info': self.handle_get_config_info,
             'client_event_get_materialx_info': self.handle_get_materialx_info,
+            'client_event_get_transform': self.handle_get_transform,
+            'client_event_stream_materialx_info': self.handle_stream_materialx_info,
+            'client_event_cancel_stream': self.handle_cancel_stream,
         }
 
 # Main entry point
@@ -218,13 +764,26 @@ def main():
     parser.add_argument('--host', type=str, default='127.0.0.1', help="Host address to run the server on (default: 127.0.0.1)")
     parser.add_argument('--port', type=int, default=5002, help="Port to run the server on (default: 5002)")
     parser.add_argument('--home', type=str, default='materialx_ocio_app.html', help="Home page.")
+    parser.add_argument('--catalog-dir', type=str, default=os.path.join(os.path.expanduser('~'), '.materialx_ocio'),
+                        help="Folder to persist generated transforms to (default: ~/.materialx_ocio)")
+    parser.add_argument('--catalog-memory-size', type=int, default=DEFAULT_MEMORY_BYTES // (1024 * 1024),
+                        help="Size in MB of the generated transforms kept in memory (default: 64)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of processes used to generate transforms (default: number of CPUs)")
+    parser.add_argument('--precompute', type=str, default=None,
+                        help="Generate transforms for all builtin configs to this target color space before starting the server. e.g. lin_rec709")
 
     args = parser.parse_args()
 
-    app = materialx_ocio_app(args.home)
-    app_host = args.host
-    app_port = args.port
-    app.run(host=app_host, port=app_port)
+    app = materialx_ocio_app(args.home, args.catalog_dir, args.workers, args.catalog_memory_size * 1024 * 1024)
+    try:
+        if args.precompute:
+            app.precompute(args.precompute)
+        app_host = args.host
+        app_port = args.port
+        app.run(host=app_host, port=app_port)
+    finally:
+        app.shutdown()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
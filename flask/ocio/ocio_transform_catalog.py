@@ -0,0 +1,185 @@
+'''
+@file ocio_transform_catalog.py
+@brief On-disk catalogue of generated MaterialX colour transforms.
+
+Generated definitions, implementations, source code and graphs are keyed by the
+OCIO and MaterialX versions and the generation settings. Each entry is stored
+in its own file in the catalogue folder. The catalogue folder is scanned at
+startup for entries of the current OCIO and MaterialX versions. Results are
+written through to disk and a size-bounded set of recently used results is kept
+in memory, so later requests are lookups without memory growing with the number
+of entries.
+'''
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Version of the generated results. Entries with a different version are not loaded.
+FORMAT_VERSION = 2
+
+# Default size budget of the in-memory tier
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+
+class OCIOTransformCatalog:
+    '''
+    Catalogue of generated colour transforms. Results are dictionaries of strings.
+    '''
+    def __init__(self, ocio_version, materialx_version, catalog_dir=None, max_memory_bytes=DEFAULT_MEMORY_BYTES):
+        '''
+        Constructor
+        @param ocio_version The OCIO version used for generation.
+        @param materialx_version The MaterialX version used for generation.
+        @param catalog_dir Folder to persist the catalogue to. If not set, the catalogue is only kept in memory.
+        @param max_memory_bytes Size budget for the results kept in memory.
+        '''
+        self.versions = { 'ocio': ocio_version, 'materialx': materialx_version, 'format': FORMAT_VERSION }
+        self.catalog_dir = catalog_dir
+        self.max_memory_bytes = max_memory_bytes
+
+        # Least recently used results in memory, and the keys of all entries on disk
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk_keys = set()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        if self.catalog_dir:
+            os.makedirs(self.catalog_dir, exist_ok=True)
+            self.load()
+
+    def make_key(self, settings):
+        '''
+        Create a catalogue key.
+        @param settings Dictionary of generation settings. e.g. the config name, target colour space and output type.
+        @return Tuple of the hex digest key and the key header.
+        '''
+        header = { 'versions': self.versions, 'settings': settings }
+        header_string = json.dumps(header, sort_keys=True)
+        return hashlib.sha256(header_string.encode('utf-8')).hexdigest(), header
+
+    def _entry_path(self, key):
+        return os.path.join(self.catalog_dir, key + '.json')
+
+    @staticmethod
+    def _result_size(result):
+        return sum(len(value) for value in result.values() if isinstance(value, str))
+
+    def _read_entry(self, path):
+        '''
+        Read a catalogue entry file.
+        @return The result, or None if the entry was generated with other versions.
+        '''
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data['header']['versions'] != self.versions:
+            return None
+        return data['result']
+
+    def load(self):
+        '''
+        Find all entries generated with the current OCIO and MaterialX versions. Results are
+        kept in memory up to the memory budget.
+        @return The number of entries found.
+        '''
+        loaded = 0
+        for entry in os.scandir(self.catalog_dir):
+            if not entry.is_file() or not entry.name.endswith('.json'):
+                continue
+            try:
+                result = self._read_entry(entry.path)
+                if result is None:
+                    continue
+                key = entry.name[:-len('.json')]
+                with self.lock:
+                    self.disk_keys.add(key)
+                    self._put_memory(key, result)
+                loaded += 1
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f'> Skipping catalogue entry: {entry.name}. Error: {e}')
+        return loaded
+
+    def _put_memory(self, key, result):
+        '''
+        Add a result to the memory tier, evicting least recently used results to stay
+        within budget. Must be called with the lock held.
+        '''
+        size = self._result_size(result)
+        if key in self.memory:
+            self.memory_bytes -= self._result_size(self.memory.pop(key))
+        if size > self.max_memory_bytes:
+            return
+        self.memory[key] = result
+        self.memory_bytes += size
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= self._result_size(evicted)
+
+    def get(self, settings):
+        '''
+        Look up a result. Results which are not in memory are read from disk.
+        Returns None if not in the catalogue.
+        '''
+        key, _ = self.make_key(settings)
+        with self.lock:
+            result = self.memory.get(key)
+            if result is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return result
+            on_disk = key in self.disk_keys
+
+        if on_disk:
+            try:
+                result = self._read_entry(self._entry_path(key))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f'> Failed to read catalogue entry: {key}. Error: {e}')
+                result = None
+        with self.lock:
+            if result is None:
+                self.disk_keys.discard(key)
+                self.misses += 1
+            else:
+                self._put_memory(key, result)
+                self.hits += 1
+        return result
+
+    def put(self, settings, result):
+        '''
+        Add a result to the catalogue and write it to disk.
+        @param settings Dictionary of generation settings.
+        @param result Dictionary of generated strings.
+        '''
+        key, header = self.make_key(settings)
+        with self.lock:
+            self._put_memory(key, result)
+        if not self.catalog_dir:
+            return
+        path = self._entry_path(key)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({ 'header': header, 'result': result }, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f'> Failed to write catalogue entry: {path}. Error: {e}')
+            return
+        with self.lock:
+            self.disk_keys.add(key)
+
+    def stats(self):
+        '''
+        Return catalogue statistics.
+        '''
+        with self.lock:
+            return {
+                'entries': len(self.disk_keys) if self.catalog_dir else len(self.memory),
+                'memoryEntries': len(self.memory),
+                'memoryBytes': self.memory_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'diskEnabled': bool(self.catalog_dir)
+            }
@@ -9,6 +9,11 @@ export class MaterialXOCIOClient extends WebSocketClient {
         this.materialXEditor = null;
         this.materialXEditor_impl = null;
         this.materialXEditor_source = null;
+
+        // Identifier and accumulated results of the current streaming request
+        this.streamId = null;
+        this.streamResults = null;
+        this.streamDocuments = null;
     }
 
     convertTableToBootstrapRowCol(container) {
@@ -118,6 +123,107 @@ export class MaterialXOCIOClient extends WebSocketClient {
         );
     }
 
+    streamMaterialXInfo() {
+        this.updateStatus("Emit client_event_stream_materialx_info event");
+        this.streamId = crypto.randomUUID ? crypto.randomUUID() : String(Date.now());
+        this.streamResults = { nodedef_string: '', impl_string: '', source_string: '' };
+        this.streamDocuments = { nodedef_string: null, impl_string: null };
+        this.updateMaterialXInfo(this.streamResults);
+        document.getElementById('button_event_cancel_stream').disabled = false;
+        this.emit('client_event_stream_materialx_info',
+            {
+                streamId: this.streamId,
+                nodegraphs: document.getElementById('checkbox_nodegraphs').checked
+            }
+        );
+    }
+
+    cancelStream() {
+        if (this.streamId) {
+            this.updateStatus("Emit client_event_cancel_stream event");
+            this.emit('client_event_cancel_stream', { streamId: this.streamId });
+        }
+    }
+
+    handleTransformGenerated(data) {
+        if (data.streamId !== this.streamId)
+            return;
+        const progress = (data.index + 1) + ' / ' + data.total;
+        if (data.error) {
+            this.updateStatus('Transform ' + progress + ' error: ' + data.error);
+            return;
+        }
+        this.updateStatus('Transform ' + progress + ': ' + data.source + (data.cached ? ' (cached)' : ''));
+
+        // Merge each generated document into a single document, and append source code, as it arrives
+        this.mergeStreamDocument('nodedef_string', data.nodedef_string);
+        if (data.impl_string)
+            this.mergeStreamDocument('impl_string', data.impl_string);
+        this.streamResults.source_string += data.source_string;
+        this.updateMaterialXInfo(this.streamResults);
+    }
+
+    mergeStreamDocument(key, docString) {
+        // Each streamed string is a complete document. Append the elements of its root
+        // to the accumulated document, skipping elements with a name already added.
+        const doc = new DOMParser().parseFromString(docString, 'application/xml');
+        if (doc.getElementsByTagName('parsererror').length > 0) {
+            this.updateStatus('Could not parse streamed document');
+            return;
+        }
+        const merged = this.streamDocuments[key];
+        if (!merged) {
+            this.streamDocuments[key] = doc;
+        }
+        else {
+            const root = merged.documentElement;
+            const names = new Set(Array.from(root.children, child => child.getAttribute('name')));
+            for (const child of Array.from(doc.documentElement.children)) {
+                const name = child.getAttribute('name');
+                if (name && names.has(name))
+                    continue;
+                root.appendChild(merged.importNode(child, true));
+                names.add(name);
+            }
+        }
+        this.streamResults[key] = new XMLSerializer().serializeToString(this.streamDocuments[key]);
+    }
+
+    handleStreamDone(data) {
+        if (data.streamId !== this.streamId)
+            return;
+        this.updateStatus('Stream ' + data.status + '. Transforms: ' + data.count);
+        document.getElementById('button_event_cancel_stream').disabled = true;
+        this.streamId = null;
+    }
+
+    handleStreamRejected(data) {
+        if (data.streamId !== this.streamId)
+            return;
+        this.updateStatus('Stream rejected: ' + data.reason);
+    }
+
+    getTransform() {
+        this.updateStatus("Emit client_event_get_transform event");
+        this.emit('client_event_get_transform',
+            {
+                config: document.getElementById('transform_config').value,
+                source: document.getElementById('transform_source').value,
+                target: document.getElementById('transform_target').value,
+                nodegraphs: document.getElementById('checkbox_nodegraphs').checked
+            }
+        );
+    }
+
+    handleServerTransform(data) {
+        if (data.error) {
+            this.updateStatus("Transform error: " + data.error);
+            return;
+        }
+        this.updateStatus("Received transform: " + data.source + " to " + data.target + (data.cached ? " (cached)" : ""));
+        this.updateMaterialXInfo(data);
+    }
+
     handleServerConfigInfo(data) {
         this.updateStatus("Received server config info");
         this.updateConfigInfo(data.message);
@@ -154,12 +260,29 @@ export class MaterialXOCIOClient extends WebSocketClient {
             this.getMaterialXInfo();
         });
 
+        document.getElementById('button_event_get_transform').addEventListener('click', () => {
+            this.getTransform();
+        });
+
+        document.getElementById('button_event_stream_materialx').addEventListener('click', () => {
+            this.streamMaterialXInfo();
+        });
+
+        document.getElementById('button_event_cancel_stream').addEventListener('click', () => {
+            this.cancelStream();
+        });
+
 
         // Set up socket message event handlers
         this.webSocketWrapper = new WebSocketEventHandlers(this.socket, {
             status_message: (data) => { console.log('WEB: status event:', data.message); this.updateStatus(data.message) },
             server_message_get_config_info: (data) => { this.handleServerConfigInfo(data) },
             server_message_get_mtlx_info: (data) => { this.handleServerMaterialXInfo(data) },
+            server_message_get_transform: (data) => { this.handleServerTransform(data) },
+            // Acknowledge each transform so that the server generates the next ones
+            server_message_transform_generated: (data, ack) => { this.handleTransformGenerated(data); if (ack) ack(); },
+            server_message_stream_rejected: (data) => { this.handleStreamRejected(data) },
+            server_message_stream_done: (data) => { this.handleStreamDone(data) },
             server_message_version_info: (data) => { this.handleServerVersionInfo(data) }
         });
 
@@ -3,8 +3,9 @@
 @brief __PYTHON_APP_DESCRIPTION__
 '''
 import argparse
-from flask import Flask, render_template
-from flask_socketio import SocketIO, emit
+import threading
+from flask import Flask, render_template, request
+from flask_socketio import SocketIO, emit, join_room, leave_room
 
 class MaterialXFlaskApp:
     def __init__(self, home):
@@ -14,6 +15,15 @@ class MaterialXFlaskApp:
         self.app = Flask(__name__)
         self.socketio = SocketIO(self.app)
 
+        # Shared room joined by each client session. Responses are sent to all
+        # clients in the room if the requesting client joined one, and otherwise
+        # only to the requesting client.
+        self.client_rooms = {}
+
+        # Connected client sessions. Guarded together with client_rooms by client_lock.
+        self.connected_clients = set()
+        self.client_lock = threading.Lock()
+
         # Register routes and events
         self._register_routes()
         self._setup_event_handler_map()
@@ -43,6 +53,78 @@ class MaterialXFlaskApp:
         # Dynamically register event handlers
         for event_name, handler in self.event_handlers.items():
             self.socketio.on_event(event_name, handler)        
+        self.socketio.on_event('connect', self.handle_connect)
+        self.socketio.on_event('join_room', self.handle_join_room)
+        self.socketio.on_event('leave_room', self.handle_leave_room)
+        self.socketio.on_event('disconnect', self.handle_disconnect)
+
+    def handle_connect(self, auth=None):
+        """
+        Record a connected client session.
+        """
+        with self.client_lock:
+            self.connected_clients.add(request.sid)
+
+    def handle_join_room(self, data):
+        """
+        Handle request to join a shared room. Responses to requests from any client
+        in the room are sent to all clients in the room. Rooms named after a connected
+        client session are rejected, as joining one would receive that client's responses.
+        """
+        room = data.get('room', '')
+        if not room:
+            return
+        with self.client_lock:
+            if room in self.connected_clients:
+                rejected = True
+            else:
+                rejected = False
+                previous_room = self.client_rooms.get(request.sid)
+                self.client_rooms[request.sid] = room
+        if rejected:
+            emit('room_rejected', { 'room': room })
+            return
+        if previous_room:
+            leave_room(previous_room)
+        join_room(room)
+        emit('room_joined', { 'room': room })
+
+    def handle_leave_room(self, data):
+        """
+        Handle request to leave the shared room. Responses are then only sent to the client.
+        """
+        with self.client_lock:
+            room = self.client_rooms.pop(request.sid, None)
+        if room:
+            leave_room(room)
+        emit('room_left', { 'room': room })
+
+    def handle_disconnect(self, reason=None):
+        """
+        Remove a disconnected client session and its room.
+        """
+        with self.client_lock:
+            self.connected_clients.discard(request.sid)
+            self.client_rooms.pop(request.sid, None)
+
+    def _client_target(self):
+        """
+        Return the recipient of responses to the current request: the shared room
+        of the requesting client if it joined one, otherwise the client session.
+        Must be called from within a SocketIO event handler.
+        """
+        with self.client_lock:
+            return self.client_rooms.get(request.sid, request.sid)
+
+    def _emit_to_client(self, event, data, to=None):
+        """
+        Emit a response to the requesting client, or to all clients in its shared room.
+        @param event The event name.
+        @param data The event data.
+        @param to The recipient returned by _client_target(). Required when called
+        outside of a SocketIO event handler.
+        """
+        self.socketio.emit(event, data, to=to or self._client_target())
 
     def run(self, host, port, debug=True):
         """
@@ -64,7 +146,7 @@ class template_flask_app(MaterialXFlaskApp):
         """
         Emit a status message to the client.
         """
-        emit('status_message', { 'message': message }, broadcast=True)
+        self._emit_to_client('status_message', { 'message': message })
 
     def _handle_client_event_1(self, data):
         '''
@@ -72,7 +154,7 @@ class template_flask_app(MaterialXFlaskApp):
         '''
         event_data = data.get('message', 'Message')
         server_message_1 = "server handled: " + event_data
-        emit('server_message_1', { 'message': server_message_1 }, broadcast=True)
+        self._emit_to_client('server_message_1', { 'message': server_message_1 })
 
     def _handle_client_event_2(self, data):
         '''
@@ -80,7 +162,7 @@ class template_flask_app(MaterialXFlaskApp):
         '''
         event_data = data.get('message', 'Message')
         server_message_2 = "server handled: " + event_data
-        emit('server_message_1', { 'message': server_message_2 }, broadcast=True)
+        self._emit_to_client('server_message_1', { 'message': server_message_2 })
 
     def _setup_event_handler_map(self):
         """